@@ -1,15 +1,20 @@
 """AI Copilot Wallet - Telegram Bot Entry Point"""
 
+import asyncio
 import hashlib
 import hmac
 import logging
 import sys
+from typing import Any, Dict, Optional
 
 import aiohttp
+import orjson
+import uvloop
 from aiohttp import web
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.enums import ParseMode
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
@@ -23,7 +28,11 @@ from src.database.postgres import (
     complete_linking_session,
     store_ephemeral_key,
     get_ephemeral_key,
+    linking_session_cache_ttl,
+    LINKING_SESSION_CACHE_TTL,
 )
+from src.services.sui import sui_service
+from src.utils.cache import TTLCache
 
 # Configure logging
 logging.basicConfig(
@@ -33,17 +42,151 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Max concurrent webhook deliveries Telegram may open to us (Bot API default is 40)
+WEBHOOK_MAX_CONNECTIONS = 100
+# Outbound connection pool for our own Bot API calls (sendMessage, editMessageText, ...)
+BOT_API_CONNECTION_LIMIT = 100
+# Updates processed at once; further acked deliveries wait for a free slot
+MAX_UPDATES_IN_FLIGHT = 100
+
 # Initialize Bot instance
 bot = Bot(
     token=settings.TELEGRAM_BOT_TOKEN,
+    session=AiohttpSession(limit=BOT_API_CONNECTION_LIMIT, json_loads=orjson.loads),
     default=DefaultBotProperties(parse_mode=ParseMode.HTML),
 )
 
 
-async def on_startup(bot: Bot) -> None:
+def json_response(data, status: int = 200) -> web.Response:
+    """JSON response serialized with orjson"""
+    return web.Response(body=orjson.dumps(data), status=status, content_type="application/json")
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Webhook handler that acks Telegram immediately and feeds the update to the
+    dispatcher in a background task, with at most `max_in_flight` updates being
+    processed at once.
+    """
+
+    def __init__(self, *args: Any, max_in_flight: int = MAX_UPDATES_IN_FLIGHT, **kwargs: Any) -> None:
+        super().__init__(*args, handle_in_background=True, **kwargs)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        async with self._in_flight:
+            await super()._background_feed_update(bot, update)
+
+
+# Serialized GET /api/link/{token} bodies - the web dApp polls this endpoint.
+# Entries are dropped by every handler that modifies the session.
+_link_json_cache = TTLCache(ttl=LINKING_SESSION_CACHE_TTL, maxsize=1024)
+
+
+@web.middleware
+async def error_log_middleware(request: web.Request, handler) -> web.StreamResponse:
+    """Lightweight access log: only non-2xx responses are logged."""
+    try:
+        response = await handler(request)
+    except web.HTTPException as exc:
+        logger.warning("%s %s -> %s", request.method, request.path, exc.status)
+        raise
+    if not 200 <= response.status < 300:
+        logger.warning("%s %s -> %s", request.method, request.path, response.status)
+    return response
+
+
+# Upper bound for JSON bodies accepted by the /api/* endpoints
+MAX_JSON_BODY = 64 * 1024
+
+
+async def read_json(request: web.Request) -> Any:
+    """Parse a JSON request body with orjson, rejecting oversized payloads (413)."""
+    if request.content_length is not None and request.content_length > MAX_JSON_BODY:
+        raise web.HTTPRequestEntityTooLarge(max_size=MAX_JSON_BODY, actual_size=request.content_length)
+    return orjson.loads(await request.read())
+
+
+# Shared HTTP client for internal services (created on startup)
+_tx_client: Optional[aiohttp.ClientSession] = None
+
+# Telegram Login Widget secret: SHA-256 of the bot token (constant for process lifetime)
+TELEGRAM_SECRET_KEY: bytes = hashlib.sha256(settings.TELEGRAM_BOT_TOKEN.encode("utf-8")).digest()
+# Keyed HMAC state, copied per verification to skip re-deriving the inner/outer pads
+_TG_HMAC_TEMPLATE = hmac.new(TELEGRAM_SECRET_KEY, b"", "sha256")
+
+
+def verify_telegram_auth(auth_payload: dict, provided_hash: str) -> bool:
+    """Verify Telegram Login Widget payload using HMAC-SHA256."""
+    if not provided_hash:
+        return False
+
+    try:
+        data_check_string = "\n".join(
+            [f"{k}={v}" for k, v in sorted(auth_payload.items()) if v is not None]
+        ).encode("utf-8")
+        mac = _TG_HMAC_TEMPLATE.copy()
+        mac.update(data_check_string)
+        computed_hash = mac.hexdigest()
+        return hmac.compare_digest(computed_hash, provided_hash)
+    except Exception as exc:
+        logger.error("Failed to verify Telegram auth: %s", exc)
+        return False
+
+
+# DB column -> API field names for linking sessions
+_RENAME_MAP: dict[str, str] = {
+    "telegram_username": "telegramUsername",
+    "telegram_first_name": "telegramFirstName",
+    "wallet_address": "walletAddress",
+    "wallet_type": "walletType",
+    "zklogin_salt": "zkLoginSalt",
+    "zklogin_sub": "zkLoginSub",
+}
+# Datetime columns, emitted as epoch milliseconds
+_DT_FIELDS: tuple[tuple[str, str], ...] = (
+    ("expires_at", "expiresAt"),
+    ("created_at", "createdAt"),
+)
+
+
+def serialize_session(session: dict) -> dict:
+    """Convert DB session (with datetimes) into JSON-safe dict."""
+    out = {_RENAME_MAP.get(key, key): value for key, value in session.items()}
+    for db_key, api_key in _DT_FIELDS:
+        value = out.get(db_key)
+        if hasattr(value, "timestamp"):
+            del out[db_key]
+            out[api_key] = int(value.timestamp() * 1000)
+    return out
+
+
+def _secret_key_to_bytes(secret_key: list) -> bytes:
+    """Convert a JSON byte array (ints, or numeric strings) into bytes."""
+    try:
+        return bytes(secret_key)
+    except TypeError:
+        # Mixed list - convert each element to int in case they're strings
+        return bytes(map(int, secret_key))
+
+
+async def on_startup(bot: Bot, dispatcher: Dispatcher) -> None:
     """Initialize database and set webhook on startup"""
+    global _tx_client
     logger.info("Starting bot...")
 
+    # Persistent connection pool to the transaction-builder service
+    _tx_client = aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=30),
+        connector=aiohttp.TCPConnector(
+            limit=200,
+            limit_per_host=100,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+            enable_cleanup_closed=True,
+        ),
+    )
+
     # Initialize database
     try:
         await init_database()
@@ -56,16 +199,26 @@ async def on_startup(bot: Bot) -> None:
     webhook_url = f"{settings.WEBHOOK_BASE_URL}{settings.WEBHOOK_PATH}"
     logger.info(f"Setting webhook to: {webhook_url}")
 
+    # Only subscribe to update types our routers actually handle
+    allowed_updates = dispatcher.resolve_used_update_types()
     await bot.set_webhook(
         webhook_url,
         secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=allowed_updates,
+        drop_pending_updates=settings.DROP_PENDING_UPDATES,
     )
-    logger.info("Webhook set successfully")
+    logger.info("Webhook set successfully (allowed_updates=%s)", allowed_updates)
 
 
 async def on_shutdown(bot: Bot) -> None:
     """Cleanup on shutdown"""
+    global _tx_client
     logger.info("Shutting down...")
+    if _tx_client is not None:
+        await _tx_client.close()
+        _tx_client = None
+    await sui_service.close()
     await close_database()
     logger.info("Database connection closed")
 
@@ -87,10 +240,10 @@ def main() -> None:
     dp.shutdown.register(on_shutdown)
 
     # Create aiohttp web application
-    app = web.Application()
+    app = web.Application(middlewares=[error_log_middleware])
 
-    # Create webhook request handler
-    webhook_requests_handler = SimpleRequestHandler(
+    # Create webhook request handler (acks immediately, processes in background)
+    webhook_requests_handler = BoundedRequestHandler(
         dispatcher=dp,
         bot=bot,
         secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
@@ -103,95 +256,59 @@ def main() -> None:
     # REST endpoints for web-dapp linking
     # ------------------------------------------------------------------ #
 
-    def verify_telegram_auth(auth_payload: dict, provided_hash: str) -> bool:
-        """Verify Telegram Login Widget payload using HMAC-SHA256."""
-        if not provided_hash:
-            return False
-
-        try:
-            data_check_string = "\n".join(
-                f"{k}={auth_payload[k]}"
-                for k in sorted(auth_payload.keys())
-                if auth_payload[k] is not None
-            )
-            secret_key = hashlib.sha256(settings.TELEGRAM_BOT_TOKEN.encode()).digest()
-            computed_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
-            return hmac.compare_digest(computed_hash, provided_hash)
-        except Exception as exc:
-            logger.error("Failed to verify Telegram auth: %s", exc)
-            return False
-
-    def serialize_session(session: dict) -> dict:
-        """Convert DB session (with datetimes) into JSON-safe dict."""
-        out = dict(session)
-        if "expires_at" in out and hasattr(out["expires_at"], "timestamp"):
-            out["expiresAt"] = int(out["expires_at"].timestamp() * 1000)
-            del out["expires_at"]
-        if "created_at" in out and hasattr(out["created_at"], "timestamp"):
-            out["createdAt"] = int(out["created_at"].timestamp() * 1000)
-            del out["created_at"]
-        if "telegram_username" in out:
-            out["telegramUsername"] = out.pop("telegram_username")
-        if "telegram_first_name" in out:
-            out["telegramFirstName"] = out.pop("telegram_first_name")
-        if "wallet_address" in out:
-            out["walletAddress"] = out.pop("wallet_address")
-        if "wallet_type" in out:
-            out["walletType"] = out.pop("wallet_type")
-        if "zklogin_salt" in out:
-            out["zkLoginSalt"] = out.pop("zklogin_salt")
-        if "zklogin_sub" in out:
-            out["zkLoginSub"] = out.pop("zklogin_sub")
-        return out
-
     async def handle_get_link(request: web.Request) -> web.Response:
         token = request.match_info.get("token")
         if not token:
-            return web.json_response({"error": "token_required"}, status=400)
+            return json_response({"error": "token_required"}, status=400)
 
-        session = await get_linking_session(token)
-        if not session:
-            return web.json_response({"error": "not_found"}, status=404)
+        body = _link_json_cache.get(token)
+        if body is None:
+            session = await get_linking_session(token)
+            if not session:
+                return json_response({"error": "not_found"}, status=404)
+            body = orjson.dumps(serialize_session(session))
+            _link_json_cache.set(token, body, ttl=linking_session_cache_ttl(session))
 
-        return web.json_response(serialize_session(session))
+        return web.Response(body=body, content_type="application/json")
 
     async def handle_set_wallet(request: web.Request) -> web.Response:
         token = request.match_info.get("token")
         if not token:
-            return web.json_response({"error": "token_required"}, status=400)
+            return json_response({"error": "token_required"}, status=400)
 
-        body = await request.json()
+        try:
+            body = await read_json(request)
+        except ValueError:
+            return json_response({"error": "invalid_json"}, status=400)
         wallet_address = body.get("walletAddress")
         wallet_type = body.get("walletType", "zklogin")
         zklogin_salt = body.get("zkLoginSalt")
         zklogin_sub = body.get("zkLoginSub")
 
         if not wallet_address:
-            return web.json_response({"error": "walletAddress_required"}, status=400)
+            return json_response({"error": "walletAddress_required"}, status=400)
 
-        session = await get_linking_session(token)
+        # The UPDATE doubles as the existence check (no row => missing or expired)
+        session = await set_linking_wallet(token, wallet_address, wallet_type, zklogin_salt, zklogin_sub)
+        _link_json_cache.pop(token)
         if not session:
-            return web.json_response({"error": "not_found"}, status=404)
-
-        ok = await set_linking_wallet(token, wallet_address, wallet_type, zklogin_salt, zklogin_sub)
-        if not ok:
-            return web.json_response({"error": "update_failed"}, status=500)
+            return json_response({"error": "not_found"}, status=404)
 
-        return web.json_response({"status": "ok"})
+        return json_response({"status": "ok"})
 
     async def handle_telegram_verify(request: web.Request) -> web.Response:
         token = request.match_info.get("token")
         if not token:
-            return web.json_response({"error": "token_required"}, status=400)
+            return json_response({"error": "token_required"}, status=400)
 
         session = await get_linking_session(token)
         if not session:
-            return web.json_response({"error": "not_found"}, status=404)
+            return json_response({"error": "not_found"}, status=404)
 
         try:
-            body = await request.json()
-        except Exception:
-            return web.json_response({"error": "invalid_json"}, status=400)
+            body = await read_json(request)
+        except ValueError:
+            return json_response({"error": "invalid_json"}, status=400)
 
         auth_payload = dict(body)
         provided_hash = auth_payload.pop("hash", None)
@@ -199,17 +316,18 @@ def main() -> None:
         telegram_id = str(telegram_id) if telegram_id is not None else None
 
         if not telegram_id:
-            return web.json_response({"error": "telegram_id_required"}, status=400)
+            return json_response({"error": "telegram_id_required"}, status=400)
 
         if not verify_telegram_auth(auth_payload, provided_hash):
-            return web.json_response({"error": "invalid_telegram_auth"}, status=401)
+            return json_response({"error": "invalid_telegram_auth"}, status=401)
 
         if session.get("telegram_id") and telegram_id != str(session["telegram_id"]):
-            return web.json_response({"error": "telegram_id_mismatch"}, status=400)
+            return json_response({"error": "telegram_id_mismatch"}, status=400)
 
         completed_session = await complete_linking_session(token)
+        _link_json_cache.pop(token)
         if not completed_session:
-            return web.json_response({"error": "complete_failed"}, status=400)
+            return json_response({"error": "complete_failed"}, status=400)
 
         wallet_address = completed_session.get("wallet_address")
 
@@ -226,7 +344,7 @@ def main() -> None:
         except Exception as exc:
             logger.warning("Failed to notify user %s of linking: %s", telegram_id, exc)
 
-        return web.json_response({
+        return json_response({
             "status": "completed",
             "walletAddress": wallet_address,
             "walletType": completed_session.get("wallet_type"),
@@ -236,33 +354,34 @@ def main() -> None:
     async def handle_complete(request: web.Request) -> web.Response:
         token = request.match_info.get("token")
         if not token:
-            return web.json_response({"error": "token_required"}, status=400)
+            return json_response({"error": "token_required"}, status=400)
 
         session = await complete_linking_session(token)
+        _link_json_cache.pop(token)
         if not session:
-            return web.json_response({"error": "not_found_or_already_completed"}, status=404)
+            return json_response({"error": "not_found_or_already_completed"}, status=404)
 
-        return web.json_response({"status": "ok"})
+        return json_response({"status": "ok"})
 
     async def handle_zklogin_salt(request: web.Request) -> web.Response:
         """Proxy zkLogin salt request to transaction-builder service."""
         token = request.match_info.get("token")
         if not token:
-            return web.json_response({"error": "token_required"}, status=400)
+            return json_response({"error": "token_required"}, status=400)
 
         # Verify token exists
         session = await get_linking_session(token)
         if not session:
-            return web.json_response({"error": "not_found"}, status=404)
+            return json_response({"error": "not_found"}, status=404)
 
         try:
-            body = await request.json()
-        except Exception:
-            return web.json_response({"error": "invalid_json"}, status=400)
+            body = await read_json(request)
+        except ValueError:
+            return json_response({"error": "invalid_json"}, status=400)
 
         jwt = body.get("jwt")
         if not jwt:
-            return web.json_response({"error": "jwt_required"}, status=400)
+            return json_response({"error": "jwt_required"}, status=400)
 
         # Get telegramId from session for salt derivation
         telegram_id = session.get("telegram_id")
@@ -272,39 +391,37 @@ def main() -> None:
         salt_url = f"{tx_service_url}/api/v1/zklogin/salt"
 
         try:
-            async with aiohttp.ClientSession() as client_session:
-                async with client_session.post(
-                    salt_url,
-                    json={"jwt": jwt, "telegramId": str(telegram_id) if telegram_id else None},
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as resp:
-                    if resp.status != 200:
-                        error_text = await resp.text()
-                        logger.error(f"Salt service error: {resp.status} - {error_text}")
-                        return web.json_response(
-                            {"error": f"Salt service error: {error_text}"},
-                            status=resp.status
-                        )
-
-                    salt_data = await resp.json()
-                    return web.json_response(salt_data)
+            async with _tx_client.post(
+                salt_url,
+                json={"jwt": jwt, "telegramId": str(telegram_id) if telegram_id else None},
+            ) as resp:
+                if resp.status != 200:
+                    error_text = await resp.text()
+                    logger.error(f"Salt service error: {resp.status} - {error_text}")
+                    return json_response(
+                        {"error": f"Salt service error: {error_text}"},
+                        status=resp.status
+                    )
+
+                salt_data = await resp.json(loads=orjson.loads)
+                return json_response(salt_data)
 
         except aiohttp.ClientError as e:
             logger.error(f"Failed to connect to salt service: {e}")
-            return web.json_response(
+            return json_response(
                 {"error": "Failed to connect to salt service"},
                 status=503
             )
         except Exception as e:
             logger.error(f"Unexpected error in zklogin-salt: {e}")
-            return web.json_response({"error": "Internal server error"}, status=500)
+            return json_response({"error": "Internal server error"}, status=500)
 
     async def handle_store_ephemeral(request: web.Request) -> web.Response:
         """Store ephemeral key for zkLogin OAuth flow."""
         try:
-            body = await request.json()
-        except Exception:
-            return web.json_response({"error": "invalid_json"}, status=400)
+            body = await read_json(request)
+        except ValueError:
+            return json_response({"error": "invalid_json"}, status=400)
 
         session_id = body.get("sessionId")
         secret_key = body.get("secretKey")
@@ -313,24 +430,21 @@ def main() -> None:
         tx_params = body.get("txParams")
 
         if not all([session_id, secret_key, max_epoch, randomness]):
-            return web.json_response({"error": "missing_fields"}, status=400)
+            return json_response({"error": "missing_fields"}, status=400)
 
         # Convert secret key array to bytes
         # Handle list (from JSON) - elements might be ints or strings
         try:
-            if isinstance(secret_key, list):
-                # Convert each element to int in case they're strings
-                secret_key_bytes = bytes([int(x) for x in secret_key])
-            elif isinstance(secret_key, str):
+            if isinstance(secret_key, str):
                 # Try to parse as JSON array if it's a string
-                import json as json_mod
-                secret_key_list = json_mod.loads(secret_key)
-                secret_key_bytes = bytes([int(x) for x in secret_key_list])
+                secret_key = orjson.loads(secret_key)
+            if isinstance(secret_key, list):
+                secret_key_bytes = _secret_key_to_bytes(secret_key)
             else:
-                return web.json_response({"error": "secret_key_must_be_array"}, status=400)
+                return json_response({"error": "secret_key_must_be_array"}, status=400)
         except (ValueError, TypeError) as e:
             logger.error(f"Failed to parse secret_key: {e}, type={type(secret_key)}")
-            return web.json_response({"error": "invalid_secret_key_format"}, status=400)
+            return json_response({"error": "invalid_secret_key_format"}, status=400)
 
         success = await store_ephemeral_key(
             session_id=session_id,
@@ -342,21 +456,21 @@ def main() -> None:
         )
 
         if success:
-            return web.json_response({"status": "ok", "sessionId": session_id})
+            return json_response({"status": "ok", "sessionId": session_id})
         else:
-            return web.json_response({"error": "storage_failed"}, status=500)
+            return json_response({"error": "storage_failed"}, status=500)
 
     async def handle_get_ephemeral(request: web.Request) -> web.Response:
         """Retrieve ephemeral key (one-time use, deletes after retrieval)."""
         session_id = request.match_info.get("sessionId")
         if not session_id:
-            return web.json_response({"error": "session_id_required"}, status=400)
+            return json_response({"error": "session_id_required"}, status=400)
 
         data = await get_ephemeral_key(session_id)
         if not data:
-            return web.json_response({"error": "not_found_or_expired"}, status=404)
+            return json_response({"error": "not_found_or_expired"}, status=404)
 
-        return web.json_response(data)
+        return json_response(data)
 
     app.router.add_get("/api/link/{token}", handle_get_link)
     app.router.add_post("/api/link/{token}/wallet", handle_set_wallet)
@@ -371,7 +485,15 @@ def main() -> None:
 
     # Start web server
     logger.info(f"Starting server on 0.0.0.0:{settings.PORT}")
-    web.run_app(app, host="0.0.0.0", port=settings.PORT)
+    web.run_app(
+        app,
+        host="0.0.0.0",
+        port=settings.PORT,
+        backlog=512,  # absorb webhook bursts instead of refusing connections
+        keepalive_timeout=75,
+        access_log=None,  # per-request logging handled by error_log_middleware
+        loop=uvloop.new_event_loop(),
+    )
 
 
 if __name__ == "__main__":
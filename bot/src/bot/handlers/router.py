@@ -1,22 +1,28 @@
 """Telegram bot handlers - wallet commands, voice, and AI chat"""
 
+import asyncio
+import functools
 import logging
 import secrets
 import re
+import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import quote, quote_plus
 
 from aiogram import Bot, Router, F
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from google.genai import errors as genai_errors
 
 from src.core import settings
-from src.utils import download_file_from_telegram, convert_ogg_to_wav
-from src.services.gemini import gemini_service
+from src.utils import TTLCache, download_file_from_telegram, convert_ogg_to_wav_async
+from src.services.gemini import get_gemini_service
 from src.services.sui import sui_service
 from src.database.postgres import (
     ensure_user,
+    ensure_user_and_get_wallet,
     get_user_wallet,
     link_wallet,
     unlink_wallet,
@@ -29,12 +35,40 @@ from src.database.postgres import (
     add_to_conversation,
     clear_conversation_history,
 )
-from src.llm.wallet_agent import wallet_agent
+from src.llm.wallet_agent import get_wallet_agent
 from src.llm.domains import Domain
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Fixed one-minute window per user: user_id -> [message count]
+RATE_LIMIT_WINDOW = 60
+_rate_windows = TTLCache(ttl=RATE_LIMIT_WINDOW, maxsize=100_000)
+
+
+@router.message.outer_middleware()
+async def rate_limit_middleware(
+    handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+    event: Message,
+    data: Dict[str, Any],
+) -> Any:
+    """Drop messages past RATE_LIMIT_REQUESTS per minute; warn once per window."""
+    limit = settings.RATE_LIMIT_REQUESTS
+    if not limit or not event.from_user:
+        return await handler(event, data)
+
+    window = _rate_windows.get(event.from_user.id)
+    if window is None:
+        window = [0]
+        _rate_windows.set(event.from_user.id, window)
+    window[0] += 1
+
+    if window[0] <= limit:
+        return await handler(event, data)
+    if window[0] == limit + 1:
+        await safe_answer(event, "⏳ Slow down a little - try again in a minute.")
+    return None
+
 
 async def safe_answer(message: Message, text: str, **kwargs) -> None:
     """Send a reply and swallow Telegram 'chat not found' errors (blocked/invalid chat)."""
@@ -52,24 +86,127 @@ async def safe_edit(status_msg: Message, text: str, **kwargs) -> None:
         logger.warning("Failed to edit message in chat %s: %s", status_msg.chat.id, exc)
 
 
-# Main menu keyboard
-def get_main_menu() -> InlineKeyboardMarkup:
+async def safe_edit_or_answer(message: Message, status_msg: Optional[Message], text: str, **kwargs) -> None:
+    """Edit the status message if we have one, otherwise send a new reply."""
+    if status_msg:
+        await safe_edit(status_msg, text, **kwargs)
+    else:
+        await safe_answer(message, text, **kwargs)
+
+
+async def answer_while_fetching(
+    message: Message,
+    status_text: str,
+    fetch: Awaitable[Any],
+) -> Tuple[Optional[Message], Any]:
+    """
+    Send a status reply and run `fetch` concurrently instead of one after the other.
+    Returns (status_msg or None if it could not be sent, fetch result); re-raises fetch errors.
+    """
+    status_msg, result = await asyncio.gather(message.answer(status_text), fetch, return_exceptions=True)
+    if isinstance(status_msg, Exception):
+        logger.warning("Failed to send status message to chat %s: %s", message.chat.id, status_msg)
+        status_msg = None
+    if isinstance(result, Exception):
+        raise result
+    return status_msg, result
+
+
+async def persisting(user_id: str, role: str, content: str, work: Awaitable[Any]) -> Any:
+    """
+    Record a conversation_history row alongside `work` (agent call or reply).
+    A failed write is only logged; errors from `work` are re-raised.
+    """
+    persisted, result = await asyncio.gather(
+        add_to_conversation(user_id, role, content), work, return_exceptions=True
+    )
+    if isinstance(persisted, Exception):
+        logger.warning("Failed to persist %s message for %s: %s", role, user_id, persisted)
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+# Streamed chat replies are sent on the first chunk, then re-edited at most every STREAM_EDIT_INTERVAL
+# seconds: often enough to read as live text, rarely enough for Telegram's per-chat edit limit
+STREAM_EDIT_INTERVAL = 0.75
+
+
+class StreamedReply:
+    """Shows a chat reply while it streams by editing one Telegram message in place."""
+
+    def __init__(self, message: Message, status_msg: Optional[Message] = None) -> None:
+        self.message = message
+        self.status_msg = status_msg
+        self._parts: list[str] = []
+        self._next_edit = 0.0
+
+    async def on_token(self, chunk: str) -> None:
+        self._parts.append(chunk)
+        now = time.monotonic()
+        if now < self._next_edit:
+            return
+        self._next_edit = now + STREAM_EDIT_INTERVAL
+        # Partial text can end mid-tag or hold a bare "<", which HTML mode rejects; send it
+        # plain and let the final safe_edit_or_answer() apply the formatting
+        text = "".join(self._parts)
+        if self.status_msg:
+            await safe_edit(self.status_msg, text, parse_mode=None)
+            return
+        try:
+            self.status_msg = await self.message.answer(text, parse_mode=None)
+        except TelegramBadRequest as exc:
+            logger.warning("Failed to send message to chat %s: %s", self.message.chat.id, exc)
+
+
+# Main menu keyboard (immutable, built once and shared by every reply)
+MAIN_MENU = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="📋 Help", callback_data="action_help"),
+        InlineKeyboardButton(text="💰 Balance", callback_data="action_balance"),
+    ],
+    [
+        InlineKeyboardButton(text="👥 Contacts", callback_data="action_contacts"),
+        InlineKeyboardButton(text="🧾 History", callback_data="action_history"),
+    ],
+    [InlineKeyboardButton(text="✉️ Send SUI", callback_data="action_send_prompt")],
+])
+
+
+_SEND_FUNDS_URL = f"{settings.WEBAPP_URL}/send-funds"
+_LINK_URL = f"{settings.WEBAPP_URL}/link/"
+
+
+def send_funds_url(recipient: str, amount: Any, sender: str) -> str:
+    """Web dApp signing URL with the query values escaped"""
+    return (
+        f"{_SEND_FUNDS_URL}?recipient={quote_plus(str(recipient))}"
+        f"&amount={quote_plus(str(amount))}&sender={quote_plus(str(sender))}"
+    )
+
+
+def sign_keyboard(tx_url: str) -> InlineKeyboardMarkup:
+    """Single 'Sign & Send' button pointing at the web dApp signing page"""
     return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="📋 Help", callback_data="action_help"),
-            InlineKeyboardButton(text="💰 Balance", callback_data="action_balance"),
-        ],
-        [
-            InlineKeyboardButton(text="👥 Contacts", callback_data="action_contacts"),
-            InlineKeyboardButton(text="🧾 History", callback_data="action_history"),
-        ],
-        [InlineKeyboardButton(text="✉️ Send SUI", callback_data="action_send_prompt")],
+        [InlineKeyboardButton(text="✍️ Sign & Send", url=tx_url)],
     ])
 
 
+ZKLOGIN_INFO_BUTTON = InlineKeyboardButton(text="❓ What is zkLogin?", callback_data="action_zklogin_info")
+
+
+_SUI_ADDR_RE = re.compile(r"0x[a-fA-F0-9]{40,64}")
+
+
 def is_valid_sui_address(address: str) -> bool:
     """Check if string is a valid Sui address"""
-    return bool(re.match(r"^0x[a-fA-F0-9]{40,64}$", address))
+    return _SUI_ADDR_RE.fullmatch(address) is not None
+
+
+@functools.lru_cache(maxsize=4096)
+def format_tx_minute(epoch_minute: int) -> str:
+    """Format an epoch minute as 'MM/DD HH:MM' (history items cluster, so this caches well)"""
+    return time.strftime('%m/%d %H:%M', time.localtime(epoch_minute * 60))
 
 
 BUTTON_TO_REQUEST = {
@@ -79,33 +216,28 @@ BUTTON_TO_REQUEST = {
     "action_help": "Help me understand what you can do",
 }
 
+# (user_id, action) pairs currently being processed; a double-tap is ignored
+_inflight_actions: set[Tuple[str, str]] = set()
+
+
+# Per-domain suggestion buttons, built once at import
+DOMAIN_SUGGESTION_KEYBOARDS = {
+    domain: InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=text, callback_data=callback)]])
+    for domain, text, callback in (
+        (Domain.balance, "💰 Show Balance", "action_balance"),
+        (Domain.payments, "✉️ Send SUI", "action_send_prompt"),
+        (Domain.contacts, "👥 Contacts", "action_contacts"),
+        (Domain.history, "🧾 History", "action_history"),
+        (Domain.help, "📋 Help", "action_help"),
+    )
+}
+
 
 def get_suggestion_keyboard_for_domain(domain: Optional[Domain]) -> Optional[InlineKeyboardMarkup]:
     """Return inline buttons tailored to the classified domain."""
     if not domain:
         return None
-
-    if domain == Domain.balance:
-        return InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="💰 Show Balance", callback_data="action_balance")]
-        ])
-    if domain == Domain.payments:
-        return InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="✉️ Send SUI", callback_data="action_send_prompt")]
-        ])
-    if domain == Domain.contacts:
-        return InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="👥 Contacts", callback_data="action_contacts")]
-        ])
-    if domain == Domain.history:
-        return InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🧾 History", callback_data="action_history")]
-        ])
-    if domain == Domain.help:
-        return InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="📋 Help", callback_data="action_help")]
-        ])
-    return None
+    return DOMAIN_SUGGESTION_KEYBOARDS.get(domain)
 
 
 # ============================================================================
@@ -119,11 +251,8 @@ async def command_start_handler(message: Message) -> None:
     username = message.from_user.username
     first_name = message.from_user.first_name
 
-    # Ensure user exists in database
-    await ensure_user(user_id, username, first_name)
-
-    # Check if user already has a wallet linked
-    wallet_address = await get_user_wallet(user_id)
+    # Ensure user exists in database and check if they already have a wallet linked
+    wallet_address = await ensure_user_and_get_wallet(user_id, username, first_name)
 
     if wallet_address:
         await safe_answer(message,
@@ -131,7 +260,7 @@ async def command_start_handler(message: Message) -> None:
             f"📱 Telegram: @{username or user_id}\n"
             f"💳 Wallet: <code>{wallet_address[:10]}...{wallet_address[-8:]}</code>\n\n"
             "Use the menu below to manage your wallet.",
-            reply_markup=get_main_menu(),
+            reply_markup=MAIN_MENU,
         )
         return
 
@@ -143,11 +272,11 @@ async def command_start_handler(message: Message) -> None:
 
     # Generate linking URL
     link_path = f"@{username}" if username else user_id
-    linking_url = f"{settings.WEBAPP_URL}/link/{link_path}?token={token}"
+    linking_url = f"{_LINK_URL}{quote(link_path, safe='@')}?token={token}"
 
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🔗 Connect Wallet", url=linking_url)],
-        [InlineKeyboardButton(text="❓ What is zkLogin?", callback_data="action_zklogin_info")],
+        [ZKLOGIN_INFO_BUTTON],
     ])
 
     await safe_answer(message,
@@ -182,7 +311,7 @@ async def command_help_handler(message: Message) -> None:
         "\"Send 1 SUI to alice\"\n"
         "\"Disconnect my wallet\""
     )
-    await safe_answer(message, wallet_commands, reply_markup=get_main_menu())
+    await safe_answer(message, wallet_commands, reply_markup=MAIN_MENU)
 
 
 @router.message(Command("reset"))
@@ -195,7 +324,7 @@ async def command_reset_handler(message: Message) -> None:
     await safe_answer(
         message,
         "🧹 Conversation history cleared.\n\nI've forgotten our previous chat. How can I help you?",
-        reply_markup=get_main_menu(),
+        reply_markup=MAIN_MENU,
     )
 
 
@@ -256,21 +385,23 @@ async def command_balance_handler(message: Message) -> None:
         return
 
     try:
-        status_msg = await message.answer("⏳ Fetching balance...")
-        balance = await sui_service.get_all_balances(wallet_address)
+        status_msg, balance = await answer_while_fetching(
+            message, "⏳ Fetching balance...", sui_service.get_all_balances(wallet_address)
+        )
 
-        text = (
+        lines = [
             f"💰 <b>Wallet Balance</b>\n\n"
             f"<code>{wallet_address}</code>\n\n"
             f"<b>SUI:</b> {balance['sui']['formatted']}\n"
-        )
+        ]
 
         if balance['tokens']:
-            text += "\n<b>Other Tokens:</b>\n"
-            for token in balance['tokens'][:5]:
-                text += f"• {token['symbol']}: {token['totalBalance']}\n"
+            lines.append("\n<b>Other Tokens:</b>\n")
+            lines.extend(f"• {token['symbol']}: {token['totalBalance']}\n" for token in balance['tokens'][:5])
+
+        text = "".join(lines)
 
-        await safe_edit(status_msg, text, reply_markup=get_main_menu())
+        await safe_edit_or_answer(message, status_msg, text, reply_markup=MAIN_MENU)
 
     except Exception as e:
         logger.error(f"Balance fetch failed: {e}")
@@ -287,27 +418,31 @@ async def command_history_handler(message: Message) -> None:
 
     if not wallet_address:
         await safe_answer(
+            message,
             "❌ No wallet linked yet.\n\nUse /start to connect your wallet first."
         )
         return
 
     try:
-        status_msg = await message.answer("⏳ Fetching transaction history...")
-        history = await sui_service.get_transaction_history(wallet_address, limit=10)
+        status_msg, history = await answer_while_fetching(
+            message,
+            "⏳ Fetching transaction history...",
+            sui_service.get_transaction_history(wallet_address, limit=10),
+        )
 
         if not history['items']:
-            await safe_edit(status_msg, "📭 No transactions found yet.")
+            await safe_edit_or_answer(message, status_msg, "📭 No transactions found yet.")
             return
 
-        text = f"🧾 <b>Recent Transactions</b>\n\n"
+        lines = ["🧾 <b>Recent Transactions</b>\n\n"]
         for tx in history['items']:
-            ts = datetime.fromtimestamp(tx['timestampMs'] / 1000).strftime('%m/%d %H:%M') if tx['timestampMs'] else '?'
+            ts = format_tx_minute(tx['timestampMs'] // 60_000) if tx['timestampMs'] else '?'
             icon = "📤" if tx['kind'] == 'sent' else "📥"
             status_icon = "✅" if tx['status'] == 'success' else "❌"
             digest_short = f"{tx['digest'][:6]}...{tx['digest'][-4:]}"
-            text += f"{icon} {ts} {status_icon} <a href=\"{tx['explorerUrl']}\">{digest_short}</a>\n"
+            lines.append(f"{icon} {ts} {status_icon} <a href=\"{tx['explorerUrl']}\">{digest_short}</a>\n")
 
-        await safe_edit(status_msg, text, disable_web_page_preview=True)
+        await safe_edit_or_answer(message, status_msg, "".join(lines), disable_web_page_preview=True)
 
     except Exception as e:
         logger.error(f"History fetch failed: {e}")
@@ -346,11 +481,13 @@ async def command_contacts_handler(message: Message) -> None:
         await safe_answer(message, "📭 No contacts saved yet.\n\nAdd one with:\n<code>/contacts add alice 0x123...</code>")
         return
 
-    text = "👥 <b>Your Contacts</b>\n\n"
-    for c in contacts:
-        text += f"• <b>{c['alias']}</b>: <code>{c['address'][:10]}...{c['address'][-6:]}</code>\n"
+    lines = ["👥 <b>Your Contacts</b>\n\n"]
+    lines.extend(
+        f"• <b>{c['alias']}</b>: <code>{c['address'][:10]}...{c['address'][-6:]}</code>\n"
+        for c in contacts
+    )
 
-    await safe_answer(message, text)
+    await safe_answer(message, "".join(lines))
 
 
 @router.message(Command("connect"))
@@ -427,12 +564,9 @@ async def command_send_handler(message: Message) -> None:
 
     # Create pending transaction and show signing link
     # For now, just show the transaction details
-    webapp_url = settings.WEBAPP_URL
-    tx_url = f"{webapp_url}/send-funds?recipient={recipient}&amount={amount}&sender={wallet_address}"
+    tx_url = send_funds_url(recipient, amount, wallet_address)
 
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="✍️ Sign & Send", url=tx_url)],
-    ])
+    keyboard = sign_keyboard(tx_url)
 
     await safe_answer(message,
         f"📋 <b>Transaction Ready</b>\n\n"
@@ -485,17 +619,27 @@ async def handle_action_callback(callback: CallbackQuery) -> None:
             return
         return
 
+    key = (user_id, action)
+    if key in _inflight_actions:
+        return
+    _inflight_actions.add(key)
+    try:
+        await run_canned_action(callback, user_id, action, canned_request)
+    finally:
+        _inflight_actions.discard(key)
+
+
+async def run_canned_action(callback: CallbackQuery, user_id: str, action: str, canned_request: str) -> None:
+    """Run a button's canned request through the agent and edit in the reply."""
     wallet_address = await get_user_wallet(user_id)
     status_msg = await callback.message.answer("Processing...")
 
     try:
-        await add_to_conversation(user_id, "user", canned_request)
-
-        result = await wallet_agent.run(
+        result = await persisting(user_id, "user", canned_request, get_wallet_agent().run(
             user_input=canned_request,
             user_id=user_id,
             wallet_address=wallet_address,
-        )
+        ))
         domain_value = result.get("domain")
         domain = None
         try:
@@ -505,23 +649,21 @@ async def handle_action_callback(callback: CallbackQuery) -> None:
 
         if result.get("needs_signing") and result.get("tx_data"):
             tx = result["tx_data"]
-            webapp_url = settings.WEBAPP_URL
-            tx_url = f"{webapp_url}/send-funds?recipient={tx['recipient']}&amount={tx['amount']}&sender={tx['sender']}"
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="✍️ Sign & Send", url=tx_url)],
-            ])
+            tx_url = send_funds_url(tx['recipient'], tx['amount'], tx['sender'])
+            keyboard = sign_keyboard(tx_url)
             reply_text = result["text"] + "\n\nClick below to sign:"
-            await add_to_conversation(user_id, "assistant", f"[Prepared send: {tx['amount']} SUI]")
-            await status_msg.edit_text(reply_text, reply_markup=keyboard)
+            await persisting(
+                user_id, "assistant", f"[Prepared send: {tx['amount']} SUI]",
+                status_msg.edit_text(reply_text, reply_markup=keyboard),
+            )
             return
 
         reply_text = result.get("text", "I didn't quite get that.")
-        await add_to_conversation(user_id, "assistant", reply_text)
-        suggestion_kb = get_suggestion_keyboard_for_domain(domain) or get_main_menu()
-        await status_msg.edit_text(reply_text, reply_markup=suggestion_kb)
+        suggestion_kb = get_suggestion_keyboard_for_domain(domain) or MAIN_MENU
+        await persisting(user_id, "assistant", reply_text, status_msg.edit_text(reply_text, reply_markup=suggestion_kb))
     except Exception as exc:
         logger.error(f"Action {action} failed: {exc}")
-        await status_msg.edit_text(f"❌ Error: {exc}", reply_markup=get_main_menu())
+        await status_msg.edit_text(f"❌ Error: {exc}", reply_markup=MAIN_MENU)
 
 
 # ============================================================================
@@ -532,25 +674,33 @@ async def handle_action_callback(callback: CallbackQuery) -> None:
 @router.message(F.voice)
 async def voice_message_handler(message: Message) -> None:
     """Handle voice messages - transcribe with Gemini then route to agent."""
-    status_msg = await message.answer("🎤 Processing your voice message...")
+    status_msg = None
 
     try:
-        audio_file_id = message.voice.file_id
-        ogg_path = await download_file_from_telegram(message.bot, audio_file_id)
-        wav_path = convert_ogg_to_wav(ogg_path)
-
-        transcription = await gemini_service.transcribe_audio(wav_path)
+        status_msg, ogg_bytes = await answer_while_fetching(
+            message,
+            "🎤 Processing your voice message...",
+            download_file_from_telegram(message.bot, message.voice.file_id),
+        )
+        # Gemini decodes Telegram's OGG/Opus itself; WAV is only a retry if it rejects the audio
+        try:
+            transcription = await get_gemini_service().transcribe_audio(ogg_bytes)
+        except genai_errors.ClientError as exc:
+            wav_bytes = await convert_ogg_to_wav_async(ogg_bytes) if exc.code == 400 else None
+            if wav_bytes is None:
+                raise
+            transcription = await get_gemini_service().transcribe_audio(wav_bytes, "audio/wav")
 
         if not transcription:
-            await safe_edit(status_msg, "❌ Could not transcribe audio. Please try again or type your message.")
+            await safe_edit_or_answer(message, status_msg, "❌ Could not transcribe audio. Please try again or type your message.")
             return
 
-        await safe_edit(status_msg, f'🎤 I heard: "<i>{transcription}</i>"\n\nProcessing...')
+        await safe_edit_or_answer(message, status_msg, f'🎤 I heard: "<i>{transcription}</i>"\n\nProcessing...')
         await process_with_agent(message, transcription, status_msg)
 
     except Exception as exc:
         logger.error(f"Voice processing failed: {exc}")
-        await safe_edit(status_msg, "❌ Error processing voice message. Please try again or type your message.")
+        await safe_edit_or_answer(message, status_msg, "❌ Error processing voice message. Please try again or type your message.")
 
 
 # ============================================================================
@@ -570,18 +720,19 @@ async def process_with_agent(
 ) -> None:
     """Process text (or transcribed voice) through the wallet agent."""
     user_id = str(message.from_user.id)
-    await ensure_user(user_id, message.from_user.username, message.from_user.first_name)
-
-    wallet_address = await get_user_wallet(user_id)
+    wallet_address = await ensure_user_and_get_wallet(
+        user_id, message.from_user.username, message.from_user.first_name
+    )
+    streamed = StreamedReply(message, status_msg)
 
     try:
-        await add_to_conversation(user_id, "user", text)
-
-        result = await wallet_agent.run(
+        result = await persisting(user_id, "user", text, get_wallet_agent().run(
             user_input=text,
             user_id=user_id,
             wallet_address=wallet_address,
-        )
+            on_token=streamed.on_token,
+        ))
+        status_msg = streamed.status_msg
         domain_value = result.get("domain")
         domain = None
         try:
@@ -591,32 +742,26 @@ async def process_with_agent(
 
         if result.get("needs_signing") and result.get("tx_data"):
             tx = result["tx_data"]
-            webapp_url = settings.WEBAPP_URL
-            tx_url = f"{webapp_url}/send-funds?recipient={tx['recipient']}&amount={tx['amount']}&sender={tx['sender']}"
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="✍️ Sign & Send", url=tx_url)],
-            ])
+            tx_url = send_funds_url(tx['recipient'], tx['amount'], tx['sender'])
+            keyboard = sign_keyboard(tx_url)
             reply_text = result["text"] + "\n\nClick below to sign:"
-            await add_to_conversation(user_id, "assistant", f"[Prepared send: {tx['amount']} SUI]")
-
-            if status_msg:
-                await safe_edit(status_msg, reply_text, reply_markup=keyboard)
-            else:
-                await safe_answer(message, reply_text, reply_markup=keyboard)
+            await persisting(
+                user_id, "assistant", f"[Prepared send: {tx['amount']} SUI]",
+                safe_edit_or_answer(message, status_msg, reply_text, reply_markup=keyboard),
+            )
             return
 
         reply_text = result.get("text", "I'm not sure how to help with that.")
-        await add_to_conversation(user_id, "assistant", reply_text)
-
-        suggestion_kb = get_suggestion_keyboard_for_domain(domain) or get_main_menu()
-        if status_msg:
-            await safe_edit(status_msg, reply_text, reply_markup=suggestion_kb)
-        else:
-            await safe_answer(message, reply_text, reply_markup=suggestion_kb)
+        suggestion_kb = get_suggestion_keyboard_for_domain(domain) or MAIN_MENU
+        await persisting(
+            user_id, "assistant", reply_text,
+            safe_edit_or_answer(message, status_msg, reply_text, reply_markup=suggestion_kb),
+        )
 
     except Exception as exc:
         logger.error(f"Agent processing failed: {exc}")
         error_text = "❌ Sorry, something went wrong. Try /help"
+        status_msg = streamed.status_msg
         if status_msg:
             await safe_edit(status_msg, error_text)
         else:
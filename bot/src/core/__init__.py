@@ -1 +1 @@
-from src.core.config import settings
\ No newline at end of file
+from src.core.config import get_settings, settings
@@ -1,20 +1,20 @@
-import os
+import functools
 from pathlib import Path
-from pydantic_settings import BaseSettings
-from pydantic import Field, ConfigDict
-from dotenv import load_dotenv
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic import Field
 
-# Load root .env file (parent of bot directory)
+# Root .env file (parent of bot directory); read by pydantic-settings itself
 root_env = Path(__file__).parent.parent.parent.parent / ".env"
-load_dotenv(root_env)
 
 
 class Settings(BaseSettings):
     """Application settings - uses root .env file"""
 
-    model_config = ConfigDict(
+    model_config = SettingsConfigDict(
+        env_file=root_env,
         case_sensitive=True,
-        extra="ignore"
+        extra="ignore",
+        frozen=True,
     )
 
     # Telegram Bot (mapped from root .env names)
@@ -25,10 +25,16 @@ class Settings(BaseSettings):
     # Server
     PORT: int = Field(default=3001)
     WEBHOOK_PATH: str = Field(default="/webhook")
+    # Discard updates Telegram queued while the bot was down
+    DROP_PENDING_UPDATES: bool = Field(default=False)
+    # Per-user message limit per minute (0 disables)
+    RATE_LIMIT_REQUESTS: int = Field(default=30)
 
     # LLM (Gemini)
     GOOGLE_AI_API_KEY: str = Field(default="")
     GEMINI_MODEL: str = Field(default="gemini-2.0-flash")
+    # Gemini requests in flight at once across the whole process, to stay under the RPM quota (0 disables)
+    GEMINI_CONCURRENCY: int = Field(default=16)
 
     # PostgreSQL Database
     POSTGRES_HOST: str = Field(default="postgres")
@@ -36,6 +42,14 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = Field(default="caishen")
     POSTGRES_PASSWORD: str = Field(default="")
     POSTGRES_DB: str = Field(default="caishen_wallet")
+    POSTGRES_POOL_MIN_SIZE: int = Field(default=5)
+    POSTGRES_POOL_MAX_SIZE: int = Field(default=50)
+    # asyncpg per-connection prepared statement cache (lifetime 0 = never expire)
+    POSTGRES_STATEMENT_CACHE_SIZE: int = Field(default=1024)
+    POSTGRES_STATEMENT_CACHE_LIFETIME: int = Field(default=0)
+    # Purge conversation turns older than this many days at startup (0 keeps them;
+    # the per-user row cap still applies)
+    CONVERSATION_RETENTION_DAYS: int = Field(default=0)
 
     # Sui Network
     SUI_RPC_URL: str = Field(default="https://fullnode.testnet.sui.io:443")
@@ -71,4 +85,10 @@ class Settings(BaseSettings):
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
 
-settings = Settings()
+@functools.cache
+def get_settings() -> Settings:
+    """Build (and validate) the settings once per process"""
+    return Settings()
+
+
+settings = get_settings()
@@ -1,23 +1,29 @@
 from src.database.postgres import (
     init_database,
     close_database,
+    db_session,
     ensure_user,
+    ensure_user_and_get_wallet,
     get_user,
     get_user_wallet,
     link_wallet,
     get_contacts,
     add_contact,
+    add_contacts,
     remove_contact,
 )
 
 __all__ = [
     "init_database",
     "close_database",
+    "db_session",
     "ensure_user",
+    "ensure_user_and_get_wallet",
     "get_user",
     "get_user_wallet",
     "link_wallet",
     "get_contacts",
     "add_contact",
+    "add_contacts",
     "remove_contact",
 ]
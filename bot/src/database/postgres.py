@@ -1,22 +1,69 @@
 """PostgreSQL database module for user and wallet management"""
 
 import asyncio
-import json
+import hashlib
 import logging
-from typing import Optional, List, Dict, Any
+from contextlib import asynccontextmanager, suppress
+from contextvars import ContextVar
+from datetime import datetime
+from typing import AsyncIterator, Optional, List, Dict, Any, Tuple
 import asyncpg
 
 from src.core import settings
+from src.utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
 # Connection pool
 _pool: Optional[asyncpg.Pool] = None
 
+# Connection pinned by db_session() for the current task, if any
+_current_conn: ContextVar[Optional[asyncpg.Connection]] = ContextVar("db_conn", default=None)
+
+# Linking sessions are read by every /api/link/* call; keep them briefly in memory
+LINKING_SESSION_CACHE_TTL = 30
+_linking_session_cache = TTLCache(ttl=LINKING_SESSION_CACHE_TTL, maxsize=1024)
+
+# telegram_id -> primary wallet ("" = no wallet). Read on nearly every update;
+# invalidated by link_wallet / unlink_wallet / full_account_reset. The TS services
+# also write wallet_links (linkWallet), which this process never hears about, so
+# entries live no longer than a cached linking session.
+WALLET_CACHE_TTL = LINKING_SESSION_CACHE_TTL
+_wallet_cache = TTLCache(ttl=WALLET_CACHE_TTL, maxsize=10_000)
+
+# telegram_id -> {lower(alias): address or None}; dropped whenever the user's contacts change
+CONTACT_CACHE_TTL = 30
+_contact_cache = TTLCache(ttl=CONTACT_CACHE_TTL, maxsize=4096)
+# telegram_id -> get_contacts() rows, same lifetime and invalidation as _contact_cache
+_contact_list_cache = TTLCache(ttl=CONTACT_CACHE_TTL, maxsize=4096)
+
+# telegram_id -> (username, first_name) last upserted. Skips the users upsert while the
+# profile is unchanged; the TTL bounds how stale users.last_seen_at can get.
+KNOWN_USER_TTL = 300
+_known_users = TTLCache(ttl=KNOWN_USER_TTL, maxsize=100_000)
+
+# Rolling window kept per user; older rows are trimmed when new ones are flushed
+CONVERSATION_MAX_ROWS_PER_USER = 200
+# Stored text is cut to this many UTF-8 bytes so a row always fits the covering
+# history index (btree entries max out near 2.7 kB); history reads use far less.
+CONVERSATION_MAX_CONTENT_BYTES = 2000
+
+# Conversation turns are buffered in memory and written in batches (COPY) off the
+# reply path. Capped so a database outage cannot grow the buffer without bound.
+# created_at comes from the column default (the DB clock, like every other row);
+# turns flushed in the same COPY share it, so history is ordered by (created_at, id).
+CONVERSATION_FLUSH_INTERVAL = 0.5
+CONVERSATION_BUFFER_MAX = 50_000
+_conversation_buffer: List[Tuple[str, str, str]] = []
+_conversation_flusher: Optional[asyncio.Task] = None
+
+# zkLogin ephemeral keys only live for the OAuth redirect round-trip; keep them in memory
+_ephemeral_keys = TTLCache(ttl=600, maxsize=10_000)
+
 
 async def init_database() -> asyncpg.Pool:
     """Initialize PostgreSQL connection pool"""
-    global _pool
+    global _pool, _conversation_flusher
     if _pool is not None:
         return _pool
 
@@ -27,142 +74,150 @@ async def init_database() -> asyncpg.Pool:
             user=settings.POSTGRES_USER,
             password=settings.POSTGRES_PASSWORD,
             database=settings.POSTGRES_DB,
-            min_size=2,
-            max_size=10,
+            min_size=settings.POSTGRES_POOL_MIN_SIZE,
+            max_size=settings.POSTGRES_POOL_MAX_SIZE,
+            max_queries=10_000,
+            max_inactive_connection_lifetime=600,
+            statement_cache_size=settings.POSTGRES_STATEMENT_CACHE_SIZE,
+            max_cached_statement_lifetime=settings.POSTGRES_STATEMENT_CACHE_LIFETIME,
             command_timeout=30,
         )
         logger.info("PostgreSQL connection pool initialized")
 
         # Create tables if they don't exist
         await _create_tables()
+        if settings.CONVERSATION_RETENTION_DAYS > 0:
+            await purge_conversation_history(settings.CONVERSATION_RETENTION_DAYS)
 
+        _conversation_flusher = asyncio.create_task(_flush_conversations_forever())
         return _pool
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
 
 
+# Whole schema, applied in one simple-query round-trip at startup
+_SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS users (
+        telegram_id VARCHAR(64) PRIMARY KEY,
+        username VARCHAR(255),
+        first_name VARCHAR(255),
+        first_seen_at TIMESTAMP DEFAULT NOW(),
+        last_seen_at TIMESTAMP DEFAULT NOW()
+    );
+
+    CREATE TABLE IF NOT EXISTS wallet_links (
+        id SERIAL PRIMARY KEY,
+        telegram_id VARCHAR(64) NOT NULL,
+        address VARCHAR(66) NOT NULL,
+        linked_via VARCHAR(32) DEFAULT 'manual',
+        label VARCHAR(255),
+        created_at TIMESTAMP DEFAULT NOW(),
+        UNIQUE(telegram_id, address)
+    );
+
+    -- Primary wallet lookup (ORDER BY created_at LIMIT 1) without a sort
+    CREATE INDEX IF NOT EXISTS idx_wallet_links_tg_created
+    ON wallet_links(telegram_id, created_at ASC) INCLUDE (address);
+
+    CREATE TABLE IF NOT EXISTS contacts (
+        id SERIAL PRIMARY KEY,
+        telegram_id VARCHAR(64) NOT NULL,
+        alias VARCHAR(255) NOT NULL,
+        address VARCHAR(66) NOT NULL,
+        created_at TIMESTAMP DEFAULT NOW(),
+        UNIQUE(telegram_id, alias)
+    );
+
+    -- resolve_contact matches LOWER(alias); the UNIQUE index above cannot serve that
+    CREATE INDEX IF NOT EXISTS idx_contacts_tg_lower_alias
+    ON contacts(telegram_id, LOWER(alias));
+
+    -- Sessions live 15 minutes; drop a legacy table that stored plaintext tokens.
+    -- Runs in the schema transaction, so the new table below replaces it atomically.
+    DO $$ BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = 'linking_sessions'
+              AND column_name = 'token'
+        ) THEN
+            DROP TABLE linking_sessions;
+        END IF;
+    END $$;
+
+    CREATE TABLE IF NOT EXISTS linking_sessions (
+        token_hash BYTEA PRIMARY KEY, -- sha256(token); the token itself is never stored
+        telegram_id VARCHAR(64) NOT NULL,
+        telegram_username VARCHAR(255),
+        telegram_first_name VARCHAR(255),
+        status VARCHAR(32) DEFAULT 'pending_wallet',
+        wallet_address VARCHAR(66),
+        wallet_type VARCHAR(32),
+        zklogin_salt TEXT,
+        zklogin_sub TEXT,
+        created_at TIMESTAMP DEFAULT NOW(),
+        expires_at TIMESTAMP NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS conversation_history (
+        id SERIAL PRIMARY KEY,
+        telegram_id VARCHAR(64) NOT NULL,
+        role VARCHAR(16) NOT NULL, -- 'user' or 'assistant'
+        content TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT NOW()
+    );
+
+    -- Covers get_conversation_history: index-only scan for the newest N turns
+    CREATE INDEX IF NOT EXISTS idx_convhist_telegram_recent
+    ON conversation_history(telegram_id, created_at DESC, id DESC) INCLUDE (role, content);
+    DROP INDEX IF EXISTS idx_convhist_telegram;
+
+    -- zkLogin salts table (used by transaction-builder for salt derivation)
+    CREATE TABLE IF NOT EXISTS zklogin_salts (
+        id SERIAL PRIMARY KEY,
+        telegram_id VARCHAR(64) NOT NULL,
+        provider TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        audience TEXT NOT NULL,
+        salt TEXT NOT NULL,
+        salt_encrypted BYTEA,
+        encryption_iv BYTEA,
+        derived_address TEXT,
+        key_claim_name TEXT NOT NULL DEFAULT 'sub',
+        created_at TIMESTAMP DEFAULT NOW(),
+        updated_at TIMESTAMP DEFAULT NOW(),
+        UNIQUE (provider, subject, audience)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_zklogin_salts_telegram
+    ON zklogin_salts(telegram_id);
+
+    CREATE INDEX IF NOT EXISTS idx_zklogin_salts_address
+    ON zklogin_salts(derived_address);
+"""
+
+
 async def _create_tables():
     """Create tables if they don't exist"""
     async with _pool.acquire() as conn:
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                telegram_id VARCHAR(64) PRIMARY KEY,
-                username VARCHAR(255),
-                first_name VARCHAR(255),
-                first_seen_at TIMESTAMP DEFAULT NOW(),
-                last_seen_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS wallet_links (
-                id SERIAL PRIMARY KEY,
-                telegram_id VARCHAR(64) NOT NULL,
-                address VARCHAR(66) NOT NULL,
-                linked_via VARCHAR(32) DEFAULT 'manual',
-                label VARCHAR(255),
-                created_at TIMESTAMP DEFAULT NOW(),
-                UNIQUE(telegram_id, address)
-            )
-        """)
-
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS contacts (
-                id SERIAL PRIMARY KEY,
-                telegram_id VARCHAR(64) NOT NULL,
-                alias VARCHAR(255) NOT NULL,
-                address VARCHAR(66) NOT NULL,
-                created_at TIMESTAMP DEFAULT NOW(),
-                UNIQUE(telegram_id, alias)
-            )
-        """)
-
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS linking_sessions (
-                token VARCHAR(64) PRIMARY KEY,
-                telegram_id VARCHAR(64) NOT NULL,
-                telegram_username VARCHAR(255),
-                telegram_first_name VARCHAR(255),
-                status VARCHAR(32) DEFAULT 'pending_wallet',
-                wallet_address VARCHAR(66),
-                wallet_type VARCHAR(32),
-                zklogin_salt TEXT,
-                zklogin_sub TEXT,
-                created_at TIMESTAMP DEFAULT NOW(),
-                expires_at TIMESTAMP NOT NULL
-            )
-        """)
-
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS conversation_history (
-                id SERIAL PRIMARY KEY,
-                telegram_id VARCHAR(64) NOT NULL,
-                role VARCHAR(16) NOT NULL, -- 'user' or 'assistant'
-                content TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_convhist_telegram
-            ON conversation_history(telegram_id, created_at DESC)
-        """)
-
-        # zkLogin salts table (used by transaction-builder for salt derivation)
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS zklogin_salts (
-                id SERIAL PRIMARY KEY,
-                telegram_id VARCHAR(64) NOT NULL,
-                provider TEXT NOT NULL,
-                subject TEXT NOT NULL,
-                audience TEXT NOT NULL,
-                salt TEXT NOT NULL,
-                salt_encrypted BYTEA,
-                encryption_iv BYTEA,
-                derived_address TEXT,
-                key_claim_name TEXT NOT NULL DEFAULT 'sub',
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW(),
-                UNIQUE (provider, subject, audience)
-            )
-        """)
-
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_zklogin_salts_telegram
-            ON zklogin_salts(telegram_id)
-        """)
-
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_zklogin_salts_address
-            ON zklogin_salts(derived_address)
-        """)
-
-        # Ephemeral keys table for zkLogin (temporary storage during OAuth flow)
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS ephemeral_keys (
-                session_id VARCHAR(64) PRIMARY KEY,
-                secret_key BYTEA NOT NULL,
-                max_epoch INTEGER NOT NULL,
-                randomness TEXT NOT NULL,
-                tx_params JSONB,
-                created_at TIMESTAMP DEFAULT NOW(),
-                expires_at TIMESTAMP NOT NULL
-            )
-        """)
-
-        # Clean up expired ephemeral keys
-        await conn.execute("""
-            DELETE FROM ephemeral_keys WHERE expires_at < NOW()
-        """)
+        async with conn.transaction():
+            await conn.execute(_SCHEMA_SQL)
 
         logger.info("Database tables verified/created")
 
 
 async def close_database():
     """Close the database pool"""
-    global _pool
+    global _pool, _conversation_flusher
+    if _conversation_flusher is not None:
+        # Wait for an in-flight flush to unwind (it requeues its batch) before the final flush
+        _conversation_flusher.cancel()
+        with suppress(asyncio.CancelledError):
+            await _conversation_flusher
+        _conversation_flusher = None
     if _pool:
+        await flush_conversation_buffer()
         await _pool.close()
         _pool = None
         logger.info("PostgreSQL connection pool closed")
@@ -175,10 +230,47 @@ async def get_pool() -> asyncpg.Pool:
     return _pool
 
 
+@asynccontextmanager
+async def db_session() -> AsyncIterator[asyncpg.Connection]:
+    """
+    Pin one pooled connection for a group of helper calls, so they skip the
+    per-call acquire/release and share its prepared-statement cache.
+    Helpers inside a session must be awaited one at a time, not gathered.
+    """
+    conn = _current_conn.get()
+    if conn is not None:
+        yield conn
+        return
+
+    pool = _pool or await get_pool()
+    async with pool.acquire() as conn:
+        token = _current_conn.set(conn)
+        try:
+            yield conn
+        finally:
+            _current_conn.reset(token)
+
+
+@asynccontextmanager
+async def _connection() -> AsyncIterator[asyncpg.Connection]:
+    """The db_session() connection if one is active, else one acquired for this call"""
+    conn = _current_conn.get()
+    if conn is not None:
+        yield conn
+        return
+
+    pool = _pool or await get_pool()
+    async with pool.acquire() as conn:
+        yield conn
+
+
 async def ensure_user(telegram_id: str, username: Optional[str] = None, first_name: Optional[str] = None):
     """Ensure user exists in database"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+    profile = (username, first_name)
+    if _known_users.get(telegram_id) == profile:
+        return
+
+    async with _connection() as conn:
         await conn.execute("""
             INSERT INTO users (telegram_id, username, first_name, last_seen_at)
             VALUES ($1, $2, $3, NOW())
@@ -187,12 +279,46 @@ async def ensure_user(telegram_id: str, username: Optional[str] = None, first_na
                 first_name = COALESCE($3, users.first_name),
                 last_seen_at = NOW()
         """, telegram_id, username, first_name)
+    _known_users.set(telegram_id, profile)
+
+
+async def ensure_user_and_get_wallet(
+    telegram_id: str,
+    username: Optional[str] = None,
+    first_name: Optional[str] = None,
+) -> Optional[str]:
+    """Upsert the user and return their primary wallet in one round-trip"""
+    profile = (username, first_name)
+    if _known_users.get(telegram_id) == profile:
+        return await get_user_wallet(telegram_id)
+
+    async with _connection() as conn:
+        address = await conn.fetchval("""
+            WITH upsert AS (
+                INSERT INTO users (telegram_id, username, first_name, last_seen_at)
+                VALUES ($1, $2, $3, NOW())
+                ON CONFLICT (telegram_id) DO UPDATE SET
+                    username = COALESCE($2, users.username),
+                    first_name = COALESCE($3, users.first_name),
+                    last_seen_at = NOW()
+            )
+            SELECT address FROM wallet_links
+            WHERE telegram_id = $1
+            ORDER BY created_at ASC
+            LIMIT 1
+        """, telegram_id, username, first_name)
+
+    _known_users.set(telegram_id, profile)
+    if address:
+        _wallet_cache.set(telegram_id, address)
+    else:
+        _wallet_cache.set(telegram_id, "")
+    return address
 
 
 async def get_user(telegram_id: str) -> Optional[Dict[str, Any]]:
     """Get user by telegram ID"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+    async with _connection() as conn:
         row = await conn.fetchrow(
             "SELECT telegram_id, username, first_name, first_seen_at, last_seen_at FROM users WHERE telegram_id = $1",
             telegram_id
@@ -202,15 +328,23 @@ async def get_user(telegram_id: str) -> Optional[Dict[str, Any]]:
 
 async def get_user_wallet(telegram_id: str) -> Optional[str]:
     """Get user's primary wallet address"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow("""
+    cached = _wallet_cache.get(telegram_id)
+    if cached is not None:
+        return cached or None
+
+    async with _connection() as conn:
+        address = await conn.fetchval("""
             SELECT address FROM wallet_links
             WHERE telegram_id = $1
             ORDER BY created_at ASC
             LIMIT 1
         """, telegram_id)
-        return row['address'] if row else None
+
+    if address:
+        _wallet_cache.set(telegram_id, address)
+        return address
+    _wallet_cache.set(telegram_id, "")
+    return None
 
 
 async def link_wallet(
@@ -220,14 +354,16 @@ async def link_wallet(
     label: Optional[str] = None
 ):
     """Link a wallet to user"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        await conn.execute("""
-            INSERT INTO wallet_links (telegram_id, address, linked_via, label)
-            VALUES ($1, $2, $3, $4)
-            ON CONFLICT (telegram_id, address) DO UPDATE SET
-                label = COALESCE($4, wallet_links.label)
-        """, telegram_id, address, linked_via, label)
+    try:
+        async with _connection() as conn:
+            await conn.execute("""
+                INSERT INTO wallet_links (telegram_id, address, linked_via, label)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (telegram_id, address) DO UPDATE SET
+                    label = COALESCE($4, wallet_links.label)
+            """, telegram_id, address, linked_via, label)
+    finally:
+        _wallet_cache.pop(telegram_id)
 
 
 async def unlink_wallet(telegram_id: str, address: Optional[str] = None) -> bool:
@@ -236,9 +372,8 @@ async def unlink_wallet(telegram_id: str, address: Optional[str] = None) -> bool
     If address is provided, only unlink that specific wallet.
     If address is None, unlink ALL wallets for the user.
     """
-    pool = await get_pool()
     try:
-        async with pool.acquire() as conn:
+        async with _connection() as conn:
             if address:
                 result = await conn.execute(
                     "DELETE FROM wallet_links WHERE telegram_id = $1 AND address = $2",
@@ -255,19 +390,19 @@ async def unlink_wallet(telegram_id: str, address: Optional[str] = None) -> bool
     except Exception as e:
         logger.error(f"Failed to unlink wallet: {e}")
         return False
+    finally:
+        _wallet_cache.pop(telegram_id)
 
 
-async def get_all_user_wallets(telegram_id: str) -> List[Dict[str, Any]]:
-    """Get all wallets linked to a user"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("""
+async def get_all_user_wallets(telegram_id: str) -> List[asyncpg.Record]:
+    """Get all wallets linked to a user (Records support row['address'])"""
+    async with _connection() as conn:
+        return await conn.fetch("""
             SELECT address, linked_via, label, created_at 
             FROM wallet_links
             WHERE telegram_id = $1
             ORDER BY created_at ASC
         """, telegram_id)
-        return [dict(row) for row in rows]
 
 
 async def full_account_reset(telegram_id: str) -> Dict[str, int]:
@@ -278,120 +413,237 @@ async def full_account_reset(telegram_id: str) -> Dict[str, int]:
     - Remove all contacts
     Returns count of items removed.
     """
-    pool = await get_pool()
-    results = {"wallets": 0, "conversations": 0, "contacts": 0}
-    
-    async with pool.acquire() as conn:
-        # Unlink wallets
-        wallet_result = await conn.execute(
-            "DELETE FROM wallet_links WHERE telegram_id = $1", telegram_id
-        )
-        results["wallets"] = int(wallet_result.split()[-1]) if wallet_result else 0
-        
-        # Clear conversation history
-        conv_result = await conn.execute(
-            "DELETE FROM conversation_history WHERE telegram_id = $1", telegram_id
-        )
-        results["conversations"] = int(conv_result.split()[-1]) if conv_result else 0
-        
-        # Remove contacts
-        contact_result = await conn.execute(
-            "DELETE FROM contacts WHERE telegram_id = $1", telegram_id
-        )
-        results["contacts"] = int(contact_result.split()[-1]) if contact_result else 0
-    
-    logger.info(f"Full account reset for {telegram_id}: {results}")
+    _drop_buffered_conversation(telegram_id)
+    async with _connection() as conn:
+        # One atomic statement, one round-trip for all three deletes
+        row = await conn.fetchrow("""
+            WITH w AS (
+                DELETE FROM wallet_links WHERE telegram_id = $1 RETURNING 1
+            ), c AS (
+                DELETE FROM conversation_history WHERE telegram_id = $1 RETURNING 1
+            ), k AS (
+                DELETE FROM contacts WHERE telegram_id = $1 RETURNING 1
+            )
+            SELECT
+                (SELECT count(*) FROM w) AS wallets,
+                (SELECT count(*) FROM c) AS conversations,
+                (SELECT count(*) FROM k) AS contacts
+        """, telegram_id)
+    results = dict(row)
+
+    _wallet_cache.pop(telegram_id)
+    _forget_contacts(telegram_id)
+    _known_users.pop(telegram_id)
+    logger.info("Full account reset for %s: %s", telegram_id, results)
     return results
 
 
-async def get_contacts(telegram_id: str) -> List[Dict[str, str]]:
-    """Get user's contacts"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
+def _forget_contacts(telegram_id: str) -> None:
+    """Drop cached contact lookups after the user's contacts change"""
+    _contact_cache.pop(telegram_id)
+    _contact_list_cache.pop(telegram_id)
+
+
+async def get_contacts(telegram_id: str) -> List[asyncpg.Record]:
+    """Get user's contacts (Records support row['alias'] / row['address'])"""
+    contacts = _contact_list_cache.get(telegram_id)
+    if contacts is not None:
+        return contacts
+    async with _connection() as conn:
+        contacts = await conn.fetch(
             "SELECT alias, address FROM contacts WHERE telegram_id = $1 ORDER BY alias",
             telegram_id
         )
-        return [dict(row) for row in rows]
+    _contact_list_cache.set(telegram_id, contacts)
+    return contacts
 
 
 async def add_contact(telegram_id: str, alias: str, address: str) -> bool:
     """Add a contact"""
-    pool = await get_pool()
     try:
-        async with pool.acquire() as conn:
+        async with _connection() as conn:
             await conn.execute("""
                 INSERT INTO contacts (telegram_id, alias, address)
                 VALUES ($1, $2, $3)
                 ON CONFLICT (telegram_id, alias) DO UPDATE SET address = $3
             """, telegram_id, alias, address)
+        _forget_contacts(telegram_id)
         return True
     except Exception as e:
         logger.error(f"Failed to add contact: {e}")
         return False
 
 
+async def add_contacts(telegram_id: str, pairs: List[Tuple[str, str]]) -> bool:
+    """Add (alias, address) pairs in one batched round-trip; later duplicates win"""
+    if not pairs:
+        return True
+    try:
+        async with _connection() as conn:
+            await conn.executemany("""
+                INSERT INTO contacts (telegram_id, alias, address)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (telegram_id, alias) DO UPDATE SET address = EXCLUDED.address
+            """, [(telegram_id, alias, address) for alias, address in pairs])
+        _forget_contacts(telegram_id)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to add contacts: {e}")
+        return False
+
+
 async def remove_contact(telegram_id: str, alias: str) -> bool:
     """Remove a contact"""
-    pool = await get_pool()
     try:
-        async with pool.acquire() as conn:
+        async with _connection() as conn:
             result = await conn.execute(
                 "DELETE FROM contacts WHERE telegram_id = $1 AND alias = $2",
                 telegram_id, alias
             )
-            return result != "DELETE 0"
+        _forget_contacts(telegram_id)
+        return result != "DELETE 0"
     except Exception as e:
         logger.error(f"Failed to remove contact: {e}")
         return False
 
 
 async def resolve_contact(telegram_id: str, alias: str) -> Optional[str]:
-    """Resolve contact alias to address"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
+    """Resolve contact alias to address (cached for CONTACT_CACHE_TTL, misses included)"""
+    key = alias.lower()
+    resolved = _contact_cache.get(telegram_id)
+    if resolved is not None and key in resolved:
+        return resolved[key]
+
+    async with _connection() as conn:
+        address = await conn.fetchval(
             "SELECT address FROM contacts WHERE telegram_id = $1 AND LOWER(alias) = LOWER($2)",
             telegram_id, alias
         )
-        return row['address'] if row else None
 
+    if resolved is None:
+        resolved = {}
+        _contact_cache.set(telegram_id, resolved)
+    resolved[key] = address
+    return address
 
-async def get_conversation_history(telegram_id: str, limit: int = 20) -> List[Dict[str, str]]:
-    """Get recent conversation history in chronological order"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("""
-            SELECT role, content as text
-            FROM conversation_history
-            WHERE telegram_id = $1
-            ORDER BY created_at DESC
-            LIMIT $2
-        """, telegram_id, limit)
-    return [dict(row) for row in reversed(rows)]
+
+async def get_conversation_history(
+    telegram_id: str,
+    limit: int = 20,
+    max_chars: int = 2048,
+) -> List[asyncpg.Record]:
+    """Get recent conversation history in chronological order, each text cut to max_chars"""
+    async with _connection() as conn:
+        # Newest N via the covering (telegram_id, created_at DESC, id DESC) index, re-sorted
+        # oldest-first server-side.
+        # substr() lets Postgres skip detoasting/sending the tail of long messages.
+        return await conn.fetch("""
+            SELECT role, text FROM (
+                SELECT id, role, substr(content, 1, $3) AS text, created_at
+                FROM conversation_history
+                WHERE telegram_id = $1
+                ORDER BY created_at DESC, id DESC
+                LIMIT $2
+            ) recent
+            ORDER BY created_at ASC, id ASC
+        """, telegram_id, limit, max_chars)
 
 
 async def add_to_conversation(telegram_id: str, role: str, content: str):
-    """Persist a message in the conversation history"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        await conn.execute("""
-            INSERT INTO conversation_history (telegram_id, role, content)
-            VALUES ($1, $2, $3)
-        """, telegram_id, role, content)
+    """Queue a message for the conversation history (written by the background flusher)"""
+    if len(_conversation_buffer) >= CONVERSATION_BUFFER_MAX:
+        logger.warning("Conversation buffer full; dropping oldest message")
+        del _conversation_buffer[0]
+    content = content.encode()[:CONVERSATION_MAX_CONTENT_BYTES].decode(errors="ignore")
+    _conversation_buffer.append((telegram_id, role, content))
+
+
+async def flush_conversation_buffer():
+    """Write all buffered conversation messages in one COPY"""
+    if not _conversation_buffer or _pool is None:
+        return
+    batch = _conversation_buffer[:]
+    _conversation_buffer.clear()
+    try:
+        async with _pool.acquire() as conn, conn.transaction():
+            await conn.copy_records_to_table(
+                "conversation_history",
+                records=batch,
+                columns=["telegram_id", "role", "content"],
+            )
+            await conn.execute("""
+                DELETE FROM conversation_history h
+                USING (
+                    SELECT id, row_number() OVER (
+                        PARTITION BY telegram_id ORDER BY created_at DESC, id DESC
+                    ) AS rn
+                    FROM conversation_history
+                    WHERE telegram_id = ANY($1::varchar[])
+                ) old
+                WHERE h.id = old.id AND old.rn > $2
+            """, list({m[0] for m in batch}), CONVERSATION_MAX_ROWS_PER_USER)
+    except asyncio.CancelledError:
+        # Shutdown cancelled the COPY; close_database() flushes the requeued batch
+        _requeue_conversation(batch)
+        raise
+    except Exception as e:
+        logger.error(f"Failed to flush {len(batch)} conversation messages: {e}")
+        _requeue_conversation(batch)
+
+
+def _requeue_conversation(batch: List[Tuple[str, str, str]]):
+    """Put an unwritten batch back in front of anything queued meanwhile"""
+    _conversation_buffer[:0] = batch
+    del _conversation_buffer[:-CONVERSATION_BUFFER_MAX]
+
+
+async def _flush_conversations_forever():
+    while True:
+        await asyncio.sleep(CONVERSATION_FLUSH_INTERVAL)
+        await flush_conversation_buffer()
+
+
+async def purge_conversation_history(older_than_days: int) -> int:
+    """Delete every user's conversation turns older than the given age; returns the row count"""
+    async with _connection() as conn:
+        status = await conn.execute(
+            "DELETE FROM conversation_history WHERE created_at < NOW() - make_interval(days => $1)",
+            older_than_days,
+        )
+    deleted = int(status.split()[-1])
+    logger.info("Purged %d conversation turns older than %d days", deleted, older_than_days)
+    return deleted
 
 
 async def clear_conversation_history(telegram_id: str):
     """Clear all stored conversation history for a user"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+    _drop_buffered_conversation(telegram_id)
+    async with _connection() as conn:
         await conn.execute(
             "DELETE FROM conversation_history WHERE telegram_id = $1",
             telegram_id
         )
 
 
+def _drop_buffered_conversation(telegram_id: str):
+    """Forget not-yet-flushed messages so a reset cannot be undone by the next flush"""
+    _conversation_buffer[:] = [m for m in _conversation_buffer if m[0] != telegram_id]
+
+
 # Linking session functions
+def _token_hash(token: str) -> bytes:
+    """SHA-256 digest stored in place of the plaintext linking token"""
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _session_from_row(row: asyncpg.Record, token: str) -> Dict[str, Any]:
+    """Row -> session dict, exposing the caller's token instead of its hash"""
+    session = dict(row)
+    del session["token_hash"]
+    session["token"] = token
+    return session
+
+
 async def create_linking_session(
     token: str,
     telegram_id: str,
@@ -400,12 +652,11 @@ async def create_linking_session(
     expires_at
 ) -> Dict[str, Any]:
     """Create a new linking session"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+    async with _connection() as conn:
         await conn.execute("""
-            INSERT INTO linking_sessions (token, telegram_id, telegram_username, telegram_first_name, expires_at)
+            INSERT INTO linking_sessions (token_hash, telegram_id, telegram_username, telegram_first_name, expires_at)
             VALUES ($1, $2, $3, $4, $5)
-        """, token, telegram_id, username, first_name, expires_at)
+        """, _token_hash(token), telegram_id, username, first_name, expires_at)
 
     return {
         "token": token,
@@ -419,39 +670,61 @@ async def create_linking_session(
 
 async def get_linking_session(token: str) -> Optional[Dict[str, Any]]:
     """Get a linking session by token"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+    cached = _linking_session_cache.get(token)
+    if cached is not None:
+        return dict(cached)
+
+    async with _connection() as conn:
         row = await conn.fetchrow(
-            "SELECT * FROM linking_sessions WHERE token = $1 AND expires_at > NOW()",
-            token
+            "SELECT * FROM linking_sessions WHERE token_hash = $1 AND expires_at > NOW()",
+            _token_hash(token)
         )
-        return dict(row) if row else None
+    if not row:
+        return None
 
+    session = _session_from_row(row, token)
+    ttl = linking_session_cache_ttl(session)
+    if ttl > 0:
+        _linking_session_cache.set(token, session, ttl=ttl)
+    return dict(session)
 
-async def update_linking_session(token: str, **updates) -> bool:
-    """Update a linking session"""
-    pool = await get_pool()
 
-    # Build SET clause dynamically
-    set_parts = []
-    values = []
-    for i, (key, value) in enumerate(updates.items(), start=1):
-        set_parts.append(f"{key} = ${i}")
-        values.append(value)
+def linking_session_cache_ttl(session: Dict[str, Any]) -> float:
+    """Seconds a session may be cached - never past its own expiry"""
+    return min(LINKING_SESSION_CACHE_TTL, (session["expires_at"] - datetime.utcnow()).total_seconds())
 
-    if not set_parts:
-        return False
-
-    values.append(token)
-    query = f"UPDATE linking_sessions SET {', '.join(set_parts)} WHERE token = ${len(values)}"
 
+async def update_linking_session(
+    token: str,
+    status: Optional[str] = None,
+    wallet_address: Optional[str] = None,
+    wallet_type: Optional[str] = None,
+    zklogin_salt: Optional[str] = None,
+    zklogin_sub: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Update a live linking session; None leaves a column unchanged.
+    Returns the updated row, or None if not found.
+    """
     try:
-        async with pool.acquire() as conn:
-            await conn.execute(query, *values)
-        return True
+        async with _connection() as conn:
+            # One fixed statement text, so it stays in asyncpg's statement cache
+            row = await conn.fetchrow("""
+                UPDATE linking_sessions SET
+                    status = COALESCE($2, status),
+                    wallet_address = COALESCE($3, wallet_address),
+                    wallet_type = COALESCE($4, wallet_type),
+                    zklogin_salt = COALESCE($5, zklogin_salt),
+                    zklogin_sub = COALESCE($6, zklogin_sub)
+                WHERE token_hash = $1 AND expires_at > NOW()
+                RETURNING *
+            """, _token_hash(token), status, wallet_address, wallet_type, zklogin_salt, zklogin_sub)
+        return _session_from_row(row, token) if row else None
     except Exception as e:
         logger.error(f"Failed to update linking session: {e}")
-        return False
+        return None
+    finally:
+        _linking_session_cache.pop(token)
 
 
 async def set_linking_wallet(
@@ -460,18 +733,16 @@ async def set_linking_wallet(
     wallet_type: str,
     zklogin_salt: Optional[str] = None,
     zklogin_sub: Optional[str] = None,
-) -> bool:
-    """Attach wallet details to a linking session."""
-    updates = {
-        "wallet_address": wallet_address,
-        "wallet_type": wallet_type,
-        "status": "pending_telegram_confirm",
-    }
-    if zklogin_salt:
-        updates["zklogin_salt"] = zklogin_salt
-    if zklogin_sub:
-        updates["zklogin_sub"] = zklogin_sub
-    return await update_linking_session(token, **updates)
+) -> Optional[Dict[str, Any]]:
+    """Attach wallet details to a linking session; returns None if the session is gone."""
+    return await update_linking_session(
+        token,
+        status="pending_telegram_confirm",
+        wallet_address=wallet_address,
+        wallet_type=wallet_type,
+        zklogin_salt=zklogin_salt or None,
+        zklogin_sub=zklogin_sub or None,
+    )
 
 
 async def store_ephemeral_key(
@@ -483,61 +754,43 @@ async def store_ephemeral_key(
     ttl_minutes: int = 10
 ) -> bool:
     """Store ephemeral key for zkLogin OAuth flow"""
-    pool = await get_pool()
-    try:
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                INSERT INTO ephemeral_keys (session_id, secret_key, max_epoch, randomness, tx_params, expires_at)
-                VALUES ($1, $2, $3, $4, $5, NOW() + INTERVAL '%s minutes')
-                ON CONFLICT (session_id) DO UPDATE SET
-                    secret_key = $2,
-                    max_epoch = $3,
-                    randomness = $4,
-                    tx_params = $5,
-                    expires_at = NOW() + INTERVAL '%s minutes'
-            """ % (ttl_minutes, ttl_minutes), session_id, secret_key, max_epoch, randomness,
-                   json.dumps(tx_params) if tx_params else None)
-        return True
-    except Exception as e:
-        logger.error(f"Failed to store ephemeral key: {e}")
-        return False
+    _ephemeral_keys.set(session_id, {
+        "secretKey": list(secret_key),
+        "maxEpoch": max_epoch,
+        "randomness": randomness,
+        "txParams": tx_params or None,
+    }, ttl=ttl_minutes * 60)
+    return True
 
 
 async def get_ephemeral_key(session_id: str) -> Optional[Dict[str, Any]]:
     """Retrieve and delete ephemeral key (one-time use)"""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow("""
-            DELETE FROM ephemeral_keys
-            WHERE session_id = $1 AND expires_at > NOW()
-            RETURNING secret_key, max_epoch, randomness, tx_params
-        """, session_id)
-        if not row:
-            return None
-        return {
-            "secretKey": list(row["secret_key"]),
-            "maxEpoch": row["max_epoch"],
-            "randomness": row["randomness"],
-            "txParams": json.loads(row["tx_params"]) if row["tx_params"] else None
-        }
+    return _ephemeral_keys.pop(session_id)
 
 
 async def complete_linking_session(token: str) -> Optional[Dict[str, Any]]:
     """Complete a linking session and link the wallet"""
-    session = await get_linking_session(token)
-    if not session or session['status'] == 'completed':
-        return None
-
-    # Update session status
-    await update_linking_session(token, status='completed')
-
-    # Link the wallet to the user
-    if session.get('wallet_address'):
-        await link_wallet(
-            session['telegram_id'],
-            session['wallet_address'],
-            session.get('wallet_type', 'zklogin')
-        )
+    try:
+        async with _connection() as conn:
+            # Single round-trip: transition a live, not-yet-completed session and link its wallet
+            row = await conn.fetchrow("""
+                WITH s AS (
+                    UPDATE linking_sessions SET status = 'completed'
+                    WHERE token_hash = $1 AND expires_at > NOW() AND status <> 'completed'
+                    RETURNING *
+                ), w AS (
+                    INSERT INTO wallet_links (telegram_id, address, linked_via)
+                    SELECT telegram_id, wallet_address, COALESCE(wallet_type, 'zklogin')
+                    FROM s WHERE wallet_address IS NOT NULL
+                    ON CONFLICT (telegram_id, address) DO NOTHING
+                )
+                SELECT * FROM s
+            """, _token_hash(token))
+    finally:
+        _linking_session_cache.pop(token)
 
-    session['status'] = 'completed'
+    if not row:
+        return None
+    session = _session_from_row(row, token)
+    _wallet_cache.pop(session['telegram_id'])
     return session
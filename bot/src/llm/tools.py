@@ -1,5 +1,9 @@
+import asyncio
 import inspect
-from typing import Any, Dict, List
+import re
+import sys
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Mapping, Tuple
 
 from langchain_core.tools import tool
 
@@ -14,7 +18,25 @@ from src.database.postgres import (
   unlink_wallet,
 )
 from src.llm.domains import Domain
-from src.services.sui import sui_service
+from src.services.sui import COIN_OBJECT_TYPE_PREFIX, sui_service
+
+_ADDR_RE = re.compile(r"0x[0-9a-fA-F]{40,64}")
+
+HELP_TEXT = """💡 Here's what I can do:
+
+🔗 Connect: Use /start to link your Sui wallet
+💰 Balance: "what's my balance?" or /balance
+✉️ Send: "send 1 SUI to alice" or /send
+👥 Contacts: "show contacts" or /contacts
+🧾 History: "show my transactions" or /history
+🖼️ NFTs: "show my NFTs"
+
+🔄 Reset Options:
+• "reset" - Clear conversation history
+• "disconnect wallet" - Unlink your wallet
+• "full reset" - Remove wallet, history & contacts
+
+Just chat naturally - I understand!"""
 
 
 # ============================================================================
@@ -28,12 +50,11 @@ async def get_balance(wallet_address: str) -> str:
   Call when user asks: 'balance', 'how much SUI', 'check wallet', 'my funds'.
   """
   balance = await sui_service.get_all_balances(wallet_address)
-  result = f"💰 Balance: {balance['sui']['formatted']}"
+  lines = [f"💰 Balance: {balance['sui']['formatted']}"]
   if balance['tokens']:
-    result += "\n\nOther tokens:"
-    for token in balance['tokens'][:5]:
-      result += f"\n• {token['symbol']}: {token['totalBalance']}"
-  return result
+    lines.append("\n\nOther tokens:")
+    lines.extend(f"\n• {token['symbol']}: {token['totalBalance']}" for token in balance['tokens'][:5])
+  return "".join(lines)
 
 
 # ============================================================================
@@ -97,10 +118,12 @@ async def list_contacts(user_id: str) -> str:
   if not contacts:
     return "📭 No contacts saved yet.\n\nAdd one: /contacts add alice 0x..."
 
-  text = "👥 Your Contacts:\n"
-  for contact in contacts:
-    text += f"\n• {contact['alias']}: {contact['address'][:10]}...{contact['address'][-6:]}"
-  return text
+  lines = ["👥 Your Contacts:\n"]
+  lines.extend(
+    f"\n• {contact['alias']}: {contact['address'][:10]}...{contact['address'][-6:]}"
+    for contact in contacts
+  )
+  return "".join(lines)
 
 
 @tool
@@ -113,8 +136,8 @@ async def add_new_contact(user_id: str, name: str, address: str) -> str:
       name: Friendly name/alias (alice, mom, work)
       address: Sui wallet address starting with 0x
   """
-  if not address.startswith("0x") or len(address) < 42:
-    return "❌ Invalid address. Must start with 0x and be 42-66 characters."
+  if not _ADDR_RE.fullmatch(address):
+    return "❌ Invalid address. Must be 0x followed by 40-64 hex characters."
 
   success = await add_contact(user_id, name, address)
   if success:
@@ -153,13 +176,13 @@ async def get_transaction_history(wallet_address: str, limit: int = 5) -> str:
   if not history['items']:
     return "📭 No transactions found yet."
 
-  text = "🧾 Recent Transactions:\n"
+  lines = ["🧾 Recent Transactions:\n"]
   for tx in history['items']:
     icon = "📤" if tx.get('kind') == 'sent' else "📥"
     status = "✅" if tx.get('status') == 'success' else "❌"
     digest = tx.get('digest', '')[:8]
-    text += f"\n{icon} {status} {digest}..."
-  return text
+    lines.append(f"\n{icon} {status} {digest}...")
+  return "".join(lines)
 
 
 # ============================================================================
@@ -173,15 +196,20 @@ async def get_nfts(wallet_address: str, limit: int = 10) -> str:
   Call when user asks: 'NFTs', 'my NFTs', 'collectibles', 'digital art'.
   """
   try:
-    nfts = await sui_service.get_owned_objects(wallet_address, limit=limit)
+    page = await sui_service.get_owned_objects(wallet_address, limit=limit)
+    # Owned objects come back with type and content inline; coin objects are not NFTs
+    nfts = [
+      obj["data"] for obj in page["data"]
+      if obj.get("data") and not obj["data"].get("type", "").startswith(COIN_OBJECT_TYPE_PREFIX)
+    ]
     if not nfts:
       return "📭 No NFTs found in your wallet."
 
-    text = "🖼️ Your NFTs:\n"
-    for nft in nfts[:limit]:
-      name = nft.get('name', 'Unnamed')
-      text += f"\n• {name}"
-    return text
+    lines = ["🖼️ Your NFTs:\n"]
+    for nft in nfts:
+      name = (nft.get("content") or {}).get("fields", {}).get("name") or nft.get("type", "").rsplit("::", 1)[-1]
+      lines.append(f"\n• {name or 'Unnamed'}")
+    return "".join(lines)
   except Exception as exc:
     return f"❌ Failed to fetch NFTs: {exc}"
 
@@ -196,21 +224,7 @@ def get_help() -> str:
   Show help information about available commands.
   Call when user asks: 'help', 'what can you do', 'commands', 'how do I', 'start', 'connect'.
   """
-  return """💡 Here's what I can do:
-
-🔗 Connect: Use /start to link your Sui wallet
-💰 Balance: "what's my balance?" or /balance
-✉️ Send: "send 1 SUI to alice" or /send
-👥 Contacts: "show contacts" or /contacts
-🧾 History: "show my transactions" or /history
-🖼️ NFTs: "show my NFTs"
-
-🔄 Reset Options:
-• "reset" - Clear conversation history
-• "disconnect wallet" - Unlink your wallet
-• "full reset" - Remove wallet, history & contacts
-
-Just chat naturally - I understand!"""
+  return HELP_TEXT
 
 
 # ============================================================================
@@ -273,14 +287,51 @@ ALL_TOOLS = [
   full_reset,
 ]
 
-DOMAIN_TOOLS: Dict[Domain, List] = {
-  Domain.balance: [get_balance],
-  Domain.payments: [send_sui],
-  Domain.contacts: [list_contacts, add_new_contact, delete_contact],
-  Domain.history: [get_transaction_history],
-  Domain.nfts: [get_nfts],
-  Domain.help: [get_help, reset_conversation, disconnect_wallet, full_reset],
-  Domain.conversation: [],  # No tools - pure chat
-}
-
-TOOL_REGISTRY = {tool.name: tool for tool in ALL_TOOLS}
+DOMAIN_TOOLS: Mapping[Domain, Tuple] = MappingProxyType({
+  Domain.balance: (get_balance,),
+  Domain.payments: (send_sui,),
+  Domain.contacts: (list_contacts, add_new_contact, delete_contact),
+  Domain.history: (get_transaction_history,),
+  Domain.nfts: (get_nfts,),
+  Domain.help: (get_help, reset_conversation, disconnect_wallet, full_reset),
+  Domain.conversation: (),  # No tools - pure chat
+})
+
+TOOL_REGISTRY: Mapping[str, Any] = MappingProxyType({sys.intern(tool.name): tool for tool in ALL_TOOLS})
+
+# Context parameters the agent injects into tool args, overriding whatever the LLM produced
+CONTEXT_PARAMS = frozenset({"user_id", "wallet_address"})
+
+
+def tool_inject_params(registry: Mapping[str, Any]) -> Mapping[str, FrozenSet[str]]:
+  """Which context parameters each tool accepts, read from its signature once up front"""
+  params = {}
+  for name, t in registry.items():
+    func = getattr(t, "coroutine", None) or getattr(t, "func", None) or t
+    params[name] = frozenset(inspect.signature(func).parameters) & CONTEXT_PARAMS
+  return MappingProxyType(params)
+
+
+TOOL_INJECT_PARAMS = tool_inject_params(TOOL_REGISTRY)
+
+ToolDispatch = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+def _dispatcher(t: Any) -> ToolDispatch:
+  """Pick how to await a tool once, instead of probing it on every call"""
+  if hasattr(t, "ainvoke"):
+    return t.ainvoke
+  func = getattr(t, "func", None) or t
+  if asyncio.iscoroutinefunction(func):
+    return lambda args: func(**args)
+  if hasattr(t, "invoke"):
+    return lambda args: asyncio.to_thread(t.invoke, args)
+  return lambda args: asyncio.to_thread(func, **args)
+
+
+def tool_dispatchers(registry: Mapping[str, Any]) -> Mapping[str, ToolDispatch]:
+  """Awaitable entry point per tool, taking the tool's args dict"""
+  return MappingProxyType({name: _dispatcher(t) for name, t in registry.items()})
+
+
+TOOL_DISPATCH = tool_dispatchers(TOOL_REGISTRY)
@@ -2,23 +2,37 @@
 Wallet Agent - LangGraph-based NL router with tool calling.
 
 Flow:
-  START → classify → route → [select_tool → run_tool] OR [chat] → END
+  START → classify (keywords, else one LLM planning call) → route → [[select_tool →] run_tool] OR [chat] → END
 """
 
 import asyncio
+import functools
 import logging
 import re
-from typing import Any, Dict, List, Optional, TypedDict, Literal
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypedDict, Literal
 
+from langchain_core.runnables import RunnableConfig
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph import END, START, StateGraph
 
 from src.core import settings
-from src.llm.domains import Domain, DomainDecision
-from src.llm.tools import DOMAIN_TOOLS, TOOL_REGISTRY
+from src.llm.domains import Domain
+from src.llm.tools import (
+    DOMAIN_TOOLS,
+    TOOL_DISPATCH,
+    TOOL_INJECT_PARAMS,
+    TOOL_REGISTRY,
+    tool_dispatchers,
+    tool_inject_params,
+)
+from src.utils.cache import TTLCache
+from src.utils.concurrency import gemini_slot
 
 logger = logging.getLogger(__name__)
 
+# Receives each streamed chunk of a chat reply as it arrives
+TokenCallback = Callable[[str], Awaitable[None]]
+
 
 # ============================================================================
 # Keyword-based fallback classification
@@ -33,17 +47,159 @@ KEYWORD_TO_DOMAIN = {
     Domain.help: ["help", "commands", "what can you do", "how do i", "reset", "clear history", "start over", "start", "connect", "link wallet", "disconnect", "unlink", "full reset", "delete everything", "remove wallet"],
 }
 
+# One compiled alternation per domain, checked in KEYWORD_TO_DOMAIN order (earlier domains win)
+KEYWORD_PATTERNS = tuple(
+    (domain, re.compile("|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))))
+    for domain, keywords in KEYWORD_TO_DOMAIN.items()
+)
+
+
+# Planner verdicts for repeated phrasings ("hi", "thanks", ...), keyed on normalized input
+CLASSIFICATION_CACHE_TTL = 3600
+CLASSIFICATION_CACHE_SIZE = 1024
+
+# Chat replies for repeated short messages, keyed on (wallet linked?, normalized input)
+CHAT_CACHE_TTL = 3600
+CHAT_CACHE_MAX_CHARS = 64
+CHAT_CACHE_SIZE = 1024
+
+# Small talk (normalized like STRONG_PATTERNS) that the planner almost always sends to chat: only
+# these get a chat reply drafted alongside classification, so actions never pay for a wasted draft
+SMALL_TALK_RE = re.compile(
+    r"(?:hi|hello|hey|yo|gm|good (?:morning|afternoon|evening)|thanks|thank you|thx|ty|ok|okay|cool|nice"
+    r"|bye|goodbye|how are you|who are you)(?: there| caishen| bot)?"
+)
+
+# Output caps: planner/tool-selection replies are one short function call, chat replies a few sentences
+TOOL_CALL_MAX_OUTPUT_TOKENS = 256
+CHAT_MAX_OUTPUT_TOKENS = 512
+
+# System prompts are kept terse (fewer prefill tokens) and static, so providers can reuse the prefix
+PLAN_PROMPT = (
+    "Sui wallet assistant. If the message asks for a wallet action (balance, sending SUI, contacts, "
+    "history, NFTs, help/reset/linking), call exactly one tool with arguments from the text; "
+    "a send_sui recipient may be a 0x address or a contact name. "
+    "For greetings or off-topic chat call no tool and answer only: chat"
+)
+SELECT_TOOL_PROMPT = (
+    "Sui wallet assistant. Always call exactly one tool, extracting its arguments from the user's text. "
+    "A send_sui recipient may be a 0x address or a contact name."
+)
+CHAT_PROMPT = (
+    "Friendly, concise assistant in a Sui wallet Telegram bot that checks balance, sends SUI, "
+    "manages contacts and shows history and NFTs. Point users to actions like "
+    "'check my balance' or 'send 1 SUI to alice'. Keep replies short."
+)
+CHAT_PROMPT_NO_WALLET = CHAT_PROMPT + " The user has no linked wallet yet; /start connects one."
+
+# Bare commands ("balance", "/help", "/history 5", ...) that map straight to a tool, skipping every LLM call.
+# Read-only only: state-changing tools (DESTRUCTIVE_TOOL_COMMANDS) need the LLM or the router's /commands
+FAST_COMMANDS = {
+    "help": ("get_help", Domain.help),
+    "balance": ("get_balance", Domain.balance),
+    "history": ("get_transaction_history", Domain.history),
+    "contacts": ("list_contacts", Domain.contacts),
+    "nfts": ("get_nfts", Domain.nfts),
+}
+
+# Domains whose actions need a linked wallet
+WALLET_REQUIRED_DOMAINS = frozenset({Domain.balance, Domain.payments, Domain.history, Domain.nfts})
+NO_WALLET_ACTIONS = {
+    Domain.balance: "check your balance",
+    Domain.payments: "send SUI",
+    Domain.history: "view transaction history",
+    Domain.nfts: "view your NFTs",
+}
+
+# Domains whose regex fallback fully specifies a read-only call; the tool-selection LLM can't improve on it
+CONFIDENT_FALLBACK_DOMAINS = frozenset({Domain.balance, Domain.history, Domain.nfts})
+
+# Tools that destroy state: only run when the LLM picked them, never from a keyword guess.
+# Values are the explicit command to suggest instead (None: just ask to rephrase).
+DESTRUCTIVE_TOOL_COMMANDS = {
+    "full_reset": "/fullreset",
+    "disconnect_wallet": "/disconnect",
+    "reset_conversation": "/reset",
+    "delete_contact": None,
+}
+
+# Whole messages (lowercased, whitespace-collapsed, trailing ?!. stripped) that are unambiguous
+# commands: keyword-classified turns matching these also skip the tool-selection LLM call
+STRONG_PATTERNS = {
+    Domain.balance: re.compile(r"(?:show |check |what'?s |what is )?(?:my )?(?:wallet )?balance"),
+    Domain.payments: re.compile(r"(?:send|transfer|pay) \d+(?:\.\d+)? (?:sui )?to (?:0x[0-9a-f]{40,64}|[\w-]+)"),
+    Domain.contacts: re.compile(r"(?:show |list )?(?:my )?contacts"),
+    Domain.history: re.compile(r"(?:show |view )?(?:my )?(?:recent )?(?:transaction history|history|transactions)"),
+    Domain.nfts: re.compile(r"(?:show |list )?(?:my )?nfts?"),
+    Domain.help: re.compile(r"help|commands|what can you do"),
+}
+
+# Argument extraction for deterministic tool selection
+_NUMBER_RE = re.compile(r"([0-9]+(?:\.[0-9]+)?)")
+_ADDRESS_RE = re.compile(r"(0x[a-fA-F0-9]{40,64})")
+# Skip filler between the verb and the name ("add new contact alice", "save address carol", "remove my contact bob")
+_NAME_FILLER = r"(?:(?:the|a|new|my)\s+)?(?:(?:contact|address)\s+)?(?!(?:contact|address)\b)"
+_REMOVE_NAME_RE = re.compile(rf"(?:delete|remove)\s+{_NAME_FILLER}([a-zA-Z0-9_\-]+)", re.IGNORECASE)
+_ADD_NAME_RE = re.compile(rf"(?:add|save)\s+{_NAME_FILLER}(?!0x)([a-zA-Z0-9_\-]+)", re.IGNORECASE)
+_TO_NAME_RE = re.compile(r"to\s+([a-zA-Z0-9_\-]+)", re.IGNORECASE)
+
+
+def _first_number(s: str) -> Optional[float]:
+    match = _NUMBER_RE.search(s)
+    return float(match.group(1)) if match else None
+
+
+def _find_address(s: str) -> Optional[str]:
+    m = _ADDRESS_RE.search(s)
+    return m.group(1) if m else None
+
+
+def fast_command(user_input: str) -> Optional[tuple[str, Domain, Dict[str, Any]]]:
+    """(tool, domain, args) for a bare command, optionally /-prefixed, @-addressed or with a limit"""
+    command, _, rest = user_input.strip().lower().partition(" ")
+    entry = FAST_COMMANDS.get(command.removeprefix("/").partition("@")[0])
+    if entry is None:
+        return None
+    rest = rest.strip()
+    if not rest:
+        return entry[0], entry[1], {}
+    if rest.isdigit() and entry[1] in (Domain.history, Domain.nfts):
+        return entry[0], entry[1], {"limit": int(rest)}
+    return None
+
 
 def keyword_classify(user_input: str) -> Optional[Domain]:
     """Fallback keyword-based classification"""
     text_lower = user_input.lower()
-    for domain, keywords in KEYWORD_TO_DOMAIN.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                return domain
+    for domain, pattern in KEYWORD_PATTERNS:
+        if pattern.search(text_lower):
+            return domain
     return None
 
 
+class _TokenRelay:
+    """Holds back chunks of a speculative chat reply until the reply is known to be wanted"""
+
+    def __init__(self) -> None:
+        self._pending: List[str] = []
+        self._sink: Optional[TokenCallback] = None
+
+    async def __call__(self, chunk: str) -> None:
+        if self._sink is None:
+            self._pending.append(chunk)
+        else:
+            await self._sink(chunk)
+
+    async def open(self, sink: TokenCallback) -> None:
+        """Replay held-back chunks in order, then forward new ones directly"""
+        i = 0
+        while i < len(self._pending):
+            await sink(self._pending[i])
+            i += 1
+        self._pending.clear()
+        self._sink = sink
+
+
 # ============================================================================
 # State Definition
 # ============================================================================
@@ -72,6 +228,62 @@ class AgentState(TypedDict, total=False):
     error: Optional[str]
 
 
+# ============================================================================
+# Graph
+# ============================================================================
+
+@functools.cache
+def build_graph() -> StateGraph:
+    """Build and compile the LangGraph state machine; nodes call the agent given in the run config"""
+
+    def agent(config: RunnableConfig) -> "WalletGraphAgent":
+        return config["configurable"]["agent"]
+
+    async def classify(state: AgentState, config: RunnableConfig) -> AgentState:
+        return await agent(config)._classify_domain(state, config)
+
+    async def select_tool(state: AgentState, config: RunnableConfig) -> AgentState:
+        return await agent(config)._select_tool(state)
+
+    async def run_tool(state: AgentState, config: RunnableConfig) -> AgentState:
+        return await agent(config)._run_tool(state)
+
+    async def chat(state: AgentState, config: RunnableConfig) -> AgentState:
+        return await agent(config)._generate_chat(state, config)
+
+    def route(state: AgentState, config: RunnableConfig) -> str:
+        return agent(config)._route_after_wallet_check(state)
+
+    graph = StateGraph(AgentState)
+
+    # Add nodes
+    graph.add_node("classify", classify)
+    graph.add_node("select_tool", select_tool)
+    graph.add_node("run_tool", run_tool)
+    graph.add_node("chat", chat)
+
+    # Add edges
+    graph.add_edge(START, "classify")
+
+    # Conditional routing after classification (wallet check included)
+    graph.add_conditional_edges(
+        "classify",
+        route,
+        {
+            "no_wallet_error": END,
+            "planned_tool": "run_tool",
+            "needs_tool": "select_tool",
+            "needs_chat": "chat",
+        }
+    )
+
+    graph.add_edge("select_tool", "run_tool")
+    graph.add_edge("run_tool", END)
+    graph.add_edge("chat", END)
+
+    return graph.compile()
+
+
 # ============================================================================
 # LangGraph Wallet Agent
 # ============================================================================
@@ -79,9 +291,9 @@ class AgentState(TypedDict, total=False):
 class WalletGraphAgent:
     """
     LangGraph-based wallet agent:
-      1) Classify domain (structured output)
+      1) Classify domain by keyword, else plan with one LLM tool-calling request (domain + tool)
       2) Route: if conversation → chat node, else → tool nodes
-      3) Select tool via LLM tool-calling
+      3) Select tool via LLM tool-calling (keyword-classified turns only)
       4) Execute tool locally
       5) Return result
     """
@@ -103,154 +315,170 @@ class WalletGraphAgent:
             model=model,
             google_api_key=api_key,
             temperature=0.3,
+            max_output_tokens=TOOL_CALL_MAX_OUTPUT_TOKENS,
         )
-        self.chat_llm = chat_llm or ChatGoogleGenerativeAI(
-            model=model,
-            google_api_key=api_key,
-            temperature=0.7,  # Higher for more natural conversation
-        )
-        # Structured output classifier
-        if hasattr(self.llm, "with_structured_output"):
-            self.domain_classifier = self.llm.with_structured_output(DomainDecision)
-        else:
-            self.domain_classifier = self.llm
+        # Chat reuses self.llm's client at a higher temperature, bound on the first conversation turn
+        self._chat_llm = chat_llm
+        self._classification_cache = TTLCache(ttl=CLASSIFICATION_CACHE_TTL, maxsize=CLASSIFICATION_CACHE_SIZE)
+        self._chat_cache = TTLCache(ttl=CHAT_CACHE_TTL, maxsize=CHAT_CACHE_SIZE)
+        # Planner calls in flight, keyed like the cache, so concurrent identical inputs share one
+        self._classifying: Dict[str, "asyncio.Task[AgentState]"] = {}
 
         self.domain_tools = domain_tools or DOMAIN_TOOLS
+        # Planner = self.llm bound to every domain's tools; a tool call names both domain and action
+        self._planner: Optional[Any] = None
+        self._tool_domains = {
+            getattr(t, "name", None) or t.__name__: domain
+            for domain, tools in self.domain_tools.items()
+            for t in tools
+        }
         self.tool_registry = tool_registry or TOOL_REGISTRY
-
-        # Build the graph
-        self.app = self._build_graph()
-
-    def _build_graph(self) -> StateGraph:
-        """Build the LangGraph state machine"""
-        graph = StateGraph(AgentState)
-
-        # Add nodes
-        graph.add_node("classify", self._classify_domain)
-        graph.add_node("check_wallet", self._check_wallet_required)
-        graph.add_node("select_tool", self._select_tool)
-        graph.add_node("run_tool", self._run_tool)
-        graph.add_node("chat", self._generate_chat)
-
-        # Add edges
-        graph.add_edge(START, "classify")
-        graph.add_edge("classify", "check_wallet")
-
-        # Conditional routing after wallet check
-        graph.add_conditional_edges(
-            "check_wallet",
-            self._route_after_wallet_check,
-            {
-                "no_wallet_error": END,
-                "needs_tool": "select_tool",
-                "needs_chat": "chat",
-            }
-        )
-
-        graph.add_edge("select_tool", "run_tool")
-        graph.add_edge("run_tool", END)
-        graph.add_edge("chat", END)
-
-        return graph.compile()
+        self._inject_params = tool_inject_params(tool_registry) if tool_registry else TOOL_INJECT_PARAMS
+        self._dispatch = tool_dispatchers(tool_registry) if tool_registry else TOOL_DISPATCH
+        # bind_tools rebuilds every tool's JSON schema, so bind once per domain
+        self._tools_bound: Dict[Domain, Any] = {}
+
+        # Topology is static, so every agent shares one compiled graph; run() passes self in the config
+        self.app = build_graph()
+
+    @property
+    def chat_llm(self) -> Any:
+        """Conversation LLM: self.llm bound to a higher temperature (and longer cap) for more natural replies"""
+        if self._chat_llm is None:
+            self._chat_llm = self.llm.bind(
+                generation_config={"temperature": 0.7, "max_output_tokens": CHAT_MAX_OUTPUT_TOKENS}
+            )
+        return self._chat_llm
 
     # ========================================================================
     # Graph Nodes
     # ========================================================================
 
-    async def _classify_domain(self, state: AgentState) -> AgentState:
-        """Node: Classify user intent into a domain"""
+    async def _classify_domain(self, state: AgentState, config: RunnableConfig) -> AgentState:
+        """Node: Classify user intent, then flag a missing wallet (no separate superstep)"""
         user_input = state["user_input"]
-        has_wallet = bool(state.get("wallet_address"))
-
-        prompt = f"""Classify this user message into exactly ONE domain. PREFER ACTION DOMAINS over conversation.
-
-Domains (in order of priority):
-1. balance: ANY mention of balance, funds, how much SUI, check wallet, my wallet (keywords: balance, how much, funds, wallet, check)
-2. payments: ANY mention of sending/transferring (keywords: send, transfer, pay, give, move)
-3. contacts: ANY mention of contacts or address book (keywords: contact, contacts, address book, save address, add, delete, remove)
-4. history: ANY mention of transactions or history (keywords: history, transactions, recent, activity, sent, received)
-5. nfts: ANY mention of NFTs (keywords: NFT, NFTs, collectibles, digital art)
-6. help: User wants help, commands, or reset (keywords: help, commands, what can you do, how, reset, clear, start over)
-7. conversation: ONLY for pure greetings or off-topic chat (hello, hi, thanks, good morning, how are you, what is blockchain)
-
-User has linked wallet: {has_wallet}
-
-CRITICAL RULES:
-- If message contains "balance", "history", "contacts", "send", "transfer", "NFT" → USE THAT DOMAIN, not conversation
-- "show my balance" → balance (NOT conversation)
-- "show my history" → history (NOT conversation)
-- "show my contacts" → contacts (NOT conversation)
-- "send 1 SUI to alice" → payments (NOT conversation)
-- "what can you do" → help (NOT conversation)
-- ONLY use "conversation" for pure greetings like "hello" or "hi" or completely unrelated topics
-- Set requires_wallet=True for: balance, payments, history, nfts
-- Set requires_wallet=False for: contacts, help, conversation
-"""
-        # First, try keyword-based classification as a fast check
-        keyword_domain = keyword_classify(user_input)
-
-        try:
-            # Run synchronously inside a thread to avoid event-loop init errors from the SDK
-            decision = await asyncio.to_thread(
-                self.domain_classifier.invoke,
-                [("system", prompt), ("human", user_input)],
-            )
+        wallet_address = state.get("wallet_address")
 
-            # If LLM says conversation but keywords say otherwise, trust keywords
-            if decision.domain == Domain.conversation and keyword_domain is not None:
-                logger.info(f"LLM said conversation, but keywords detected {keyword_domain} - using keywords")
-                state["domain"] = keyword_domain
-                state["domain_confidence"] = 0.8
-                state["domain_reason"] = f"Keyword match for {keyword_domain.value}"
-                state["requires_wallet"] = keyword_domain in [Domain.balance, Domain.payments, Domain.history, Domain.nfts]
-            else:
-                state["domain"] = decision.domain
-                state["domain_confidence"] = decision.confidence
-                state["domain_reason"] = decision.reason
-                state["requires_wallet"] = decision.requires_wallet
+        # Draft a reply in parallel only for small talk the planner will route to chat anyway
+        chat_task = None
+        normalized = " ".join(user_input.lower().split()).rstrip("?!.")
+        if SMALL_TALK_RE.fullmatch(normalized) and keyword_classify(user_input) is None:
+            chat_state: AgentState = {
+                "user_input": user_input,
+                "wallet_address": wallet_address,
+            }
+            relay = _TokenRelay()
+            chat_task = asyncio.create_task(self._chat(chat_state, relay))
 
-            logger.info(f"Classified: {state['domain']} (conf={state['domain_confidence']:.2f}): {state['domain_reason']}")
+        try:
+            update = await self._classify(user_input)
+            update.update(self._check_wallet_required(update, wallet_address))
+
+            if chat_task is not None and self._route_after_wallet_check(update) == "needs_chat":
+                on_token = config["configurable"].get("on_token")
+                if on_token is not None:
+                    await relay.open(on_token)
+                update.update(await chat_task)
+        finally:
+            if chat_task is not None and not chat_task.done():
+                chat_task.cancel()
+
+        return update
+
+    async def _classify(self, user_input: str) -> AgentState:
+        """Classify user intent into a domain; returns the classification keys"""
+        # Keyword hits already win over an LLM "conversation" verdict, so skip the LLM for them
+        normalized = " ".join(user_input.lower().split())
+        keyword_domain = keyword_classify(user_input)
+        if keyword_domain is not None:
+            logger.info("Classified by keyword: %s", keyword_domain)
+            update: AgentState = {
+                "domain": keyword_domain,
+                "domain_confidence": 0.95,
+                "domain_reason": f"Keyword match for {keyword_domain.value}",
+                "requires_wallet": keyword_domain in WALLET_REQUIRED_DOMAINS,
+            }
+            strong = STRONG_PATTERNS.get(keyword_domain)
+            if strong is not None and strong.fullmatch(normalized.rstrip("?!.")):
+                tool_name, tool_args, _ = self._fallback_tool_selection(keyword_domain, user_input)
+                if tool_name:
+                    update["tool_name"] = tool_name
+                    update["tool_args"] = tool_args
+            return update
+
+        # Whole text as the key: a plan's tool_args come from all of it
+        cache_key = normalized
+        try:
+            plan = self._classification_cache.get(cache_key)
+            if plan is None:
+                task = self._classifying.get(cache_key)
+                if task is None:
+                    task = asyncio.create_task(self._plan(user_input))
+                    self._classifying[cache_key] = task
+                    task.add_done_callback(lambda _: self._classifying.pop(cache_key, None))
+                # Shielded so one caller's cancellation doesn't fail the others sharing the call
+                plan = await asyncio.shield(task)
+                # Only argument-free verdicts are reused; an action is re-planned every time
+                if not plan.get("tool_name"):
+                    self._classification_cache.set(cache_key, plan)
+
+            logger.info("Classified: %s: %s", plan["domain"], plan["domain_reason"])
+            return dict(plan)  # callers extend the update; keep the cached plan intact
 
         except Exception as e:
-            logger.error(f"Domain classification failed: {e}")
-            # Use keyword fallback on error
-            if keyword_domain:
-                state["domain"] = keyword_domain
-                state["domain_confidence"] = 0.7
-                state["domain_reason"] = f"Keyword fallback: {keyword_domain.value}"
-                state["requires_wallet"] = keyword_domain in [Domain.balance, Domain.payments, Domain.history, Domain.nfts]
-            else:
-                state["domain"] = Domain.conversation
-                state["domain_confidence"] = 0.5
-                state["domain_reason"] = "Classification error, defaulting to conversation"
-                state["requires_wallet"] = False
+            logger.error("Domain classification failed: %s", e)
+            return {
+                "domain": Domain.conversation,
+                "domain_confidence": 0.5,
+                "domain_reason": "Classification error, defaulting to conversation",
+                "requires_wallet": False,
+            }
 
-        return state
+    async def _plan(self, user_input: str) -> AgentState:
+        """One LLM call that classifies and, for actions, also selects the tool and its args"""
+        if self._planner is None:
+            self._planner = self.llm.bind_tools([t for tools in self.domain_tools.values() for t in tools])
 
-    async def _check_wallet_required(self, state: AgentState) -> AgentState:
-        """Node: Check if wallet is required but missing"""
-        domain = state.get("domain", Domain.conversation)
-        requires_wallet = state.get("requires_wallet", False)
-        wallet_address = state.get("wallet_address")
+        async with gemini_slot():
+            ai_msg = await self._planner.ainvoke([("system", PLAN_PROMPT), ("human", user_input)])
+        calls = getattr(ai_msg, "tool_calls", None) or []
+        domain = self._tool_domains.get(calls[0]["name"]) if calls else None
+        if domain is None:
+            return {
+                "domain": Domain.conversation,
+                "domain_confidence": 0.9,
+                "domain_reason": "No action requested",
+                "requires_wallet": False,
+            }
+        return {
+            "domain": domain,
+            "domain_confidence": 0.9,
+            "domain_reason": f"Planned {calls[0]['name']}",
+            "requires_wallet": domain in WALLET_REQUIRED_DOMAINS,
+            "tool_name": calls[0]["name"],
+            "tool_args": calls[0].get("args", {}),
+        }
 
-        wallet_required_domains = [Domain.balance, Domain.payments, Domain.history, Domain.nfts]
+    def _check_wallet_required(self, classification: AgentState, wallet_address: Optional[str]) -> AgentState:
+        """Check if wallet is required but missing; returns the error keys (empty if fine)"""
+        domain = classification.get("domain", Domain.conversation)
+        requires_wallet = classification.get("requires_wallet", False)
 
-        if requires_wallet and not wallet_address and domain in wallet_required_domains:
-            state["error"] = "no_wallet"
-            action_name = {
-                Domain.balance: "check your balance",
-                Domain.payments: "send SUI",
-                Domain.history: "view transaction history",
-                Domain.nfts: "view your NFTs",
-            }.get(domain, "do that")
-            state["result"] = f"❌ No wallet linked. Use /start to connect your Sui wallet first to {action_name}."
+        if requires_wallet and not wallet_address and domain in WALLET_REQUIRED_DOMAINS:
+            action_name = NO_WALLET_ACTIONS.get(domain, "do that")
+            return {
+                "error": "no_wallet",
+                "result": f"❌ No wallet linked. Use /start to connect your Sui wallet first to {action_name}.",
+            }
 
-        return state
+        return {}
 
-    def _route_after_wallet_check(self, state: AgentState) -> Literal["no_wallet_error", "needs_tool", "needs_chat"]:
+    def _route_after_wallet_check(self, state: AgentState) -> Literal["no_wallet_error", "planned_tool", "needs_tool", "needs_chat"]:
         """Conditional edge: Route based on wallet check and domain"""
         if state.get("error") == "no_wallet":
             return "no_wallet_error"
+        if state.get("tool_name"):
+            return "planned_tool"
 
         domain = state.get("domain", Domain.conversation)
         domain_tools = self.domain_tools.get(domain, [])
@@ -268,50 +496,53 @@ CRITICAL RULES:
         domain_tools = self.domain_tools.get(domain, [])
 
         if not domain_tools:
-            state["tool_name"] = None
-            state["tool_args"] = {}
-            return state
-
-        llm_with_tools = self.llm.bind_tools(domain_tools)
+            return {"tool_name": None, "tool_args": {}}
 
-        system_msg = """You are a Sui wallet assistant. Select exactly ONE tool and extract arguments from the user's text.
+        fallback_tool, fallback_args, fallback_msg = self._fallback_tool_selection(domain, user_input)
+        if fallback_tool and (
+            domain in CONFIDENT_FALLBACK_DOMAINS
+            or str(fallback_args.get("recipient", "")).startswith("0x")
+        ):
+            logger.info("Regex-selected tool: %s with args: %s", fallback_tool, fallback_args)
+            return {"tool_name": fallback_tool, "tool_args": fallback_args}
 
-For send_sui: extract amount (number) and recipient (0x address or contact name like 'alice').
-For add_new_contact: extract name and address.
-For delete_contact: extract the contact name.
-For history: optionally extract limit (number of transactions).
-
-ALWAYS call a tool - don't respond with just text."""
+        llm_with_tools = self._tools_bound.get(domain)
+        if llm_with_tools is None:
+            llm_with_tools = self._tools_bound[domain] = self.llm.bind_tools(list(domain_tools), tool_choice="any")
 
         try:
-            # Run synchronously inside a thread to avoid event-loop init errors from the SDK
-            ai_msg = await asyncio.to_thread(
-                llm_with_tools.invoke,
-                [("system", system_msg), ("human", f"User request: {user_input}")],
-            )
+            async with gemini_slot():
+                ai_msg = await llm_with_tools.ainvoke(
+                    [("system", SELECT_TOOL_PROMPT), ("human", user_input)],
+                )
 
             if getattr(ai_msg, "tool_calls", None):
                 call = ai_msg.tool_calls[0]
-                state["tool_name"] = call["name"]
-                state["tool_args"] = call.get("args", {})
-                logger.info(f"Selected tool: {call['name']} with args: {call.get('args', {})}")
+                logger.info("Selected tool: %s with args: %s", call["name"], call.get("args", {}))
+                if call["name"]:
+                    return {"tool_name": call["name"], "tool_args": call.get("args", {})}
 
         except Exception as e:
-            logger.error(f"Tool selection failed: {e}")
+            logger.error("Tool selection failed: %s", e)
 
         # Fallback: deterministic selection if LLM did not pick a tool
-        if not state.get("tool_name"):
-            fallback_tool, fallback_args, fallback_msg = self._fallback_tool_selection(domain, user_input)
-            if fallback_tool:
-                state["tool_name"] = fallback_tool
-                state["tool_args"] = fallback_args
-                logger.info(f"Fallback-selected tool: {fallback_tool} with args: {fallback_args}")
-            else:
-                state["tool_name"] = None
-                state["tool_args"] = {}
-                state["result"] = fallback_msg or f"I understood you want help with {domain.value}, but I couldn't determine the specific action. Please try again."
-
-        return state
+        if fallback_tool in DESTRUCTIVE_TOOL_COMMANDS:
+            command = DESTRUCTIVE_TOOL_COMMANDS[fallback_tool]
+            logger.info("Not running %s from a keyword guess", fallback_tool)
+            return {
+                "tool_name": None,
+                "tool_args": {},
+                "result": f"To be safe, please confirm with {command}." if command
+                else "I couldn't confirm that action. Please rephrase, e.g. 'remove contact alice'.",
+            }
+        if fallback_tool:
+            logger.info("Fallback-selected tool: %s with args: %s", fallback_tool, fallback_args)
+            return {"tool_name": fallback_tool, "tool_args": fallback_args}
+        return {
+            "tool_name": None,
+            "tool_args": {},
+            "result": fallback_msg or f"I understood you want help with {domain.value}, but I couldn't determine the specific action. Please try again.",
+        }
 
     def _fallback_tool_selection(self, domain: Domain, user_input: str) -> tuple[Optional[str], Dict[str, Any], Optional[str]]:
         """
@@ -321,25 +552,17 @@ ALWAYS call a tool - don't respond with just text."""
         text = user_input.lower()
         args: Dict[str, Any] = {}
 
-        def first_number(s: str) -> Optional[float]:
-            match = re.search(r"([0-9]+(?:\.[0-9]+)?)", s)
-            return float(match.group(1)) if match else None
-
-        def find_address(s: str) -> Optional[str]:
-            m = re.search(r"(0x[a-fA-F0-9]{40,64})", s)
-            return m.group(1) if m else None
-
         if domain == Domain.balance:
             return "get_balance", args, None
 
         if domain == Domain.history:
-            limit = first_number(text)
+            limit = _first_number(text)
             if limit:
                 args["limit"] = int(limit)
             return "get_transaction_history", args, None
 
         if domain == Domain.nfts:
-            limit = first_number(text)
+            limit = _first_number(text)
             if limit:
                 args["limit"] = int(limit)
             return "get_nfts", args, None
@@ -358,14 +581,14 @@ ALWAYS call a tool - don't respond with just text."""
 
         if domain == Domain.contacts:
             if "delete" in text or "remove" in text:
-                name_match = re.search(r"(?:delete|remove)\s+([a-zA-Z0-9_\-]+)", user_input, re.IGNORECASE)
+                name_match = _REMOVE_NAME_RE.search(user_input)
                 if name_match:
                     args["name"] = name_match.group(1)
                     return "delete_contact", args, None
                 return None, {}, "Please tell me which contact to remove."
             if "add" in text or "save" in text:
-                address = find_address(user_input)
-                name_match = re.search(r"(?:add|save)\s+([a-zA-Z0-9_\-]+)", user_input, re.IGNORECASE)
+                address = _find_address(user_input)
+                name_match = _ADD_NAME_RE.search(user_input)
                 if address and name_match:
                     args["name"] = name_match.group(1)
                     args["address"] = address
@@ -374,11 +597,11 @@ ALWAYS call a tool - don't respond with just text."""
             return "list_contacts", args, None
 
         if domain == Domain.payments:
-            amount = first_number(user_input)
-            recipient = find_address(user_input)
+            amount = _first_number(user_input)
+            recipient = _find_address(user_input)
             if not recipient:
                 # try word after 'to'
-                to_match = re.search(r"to\s+([a-zA-Z0-9_\-]+)", user_input, re.IGNORECASE)
+                to_match = _TO_NAME_RE.search(user_input)
                 if to_match:
                     recipient = to_match.group(1)
             if amount is None or amount <= 0:
@@ -395,120 +618,107 @@ ALWAYS call a tool - don't respond with just text."""
     async def _run_tool(self, state: AgentState) -> AgentState:
         """Node: Execute the selected tool"""
         tool_name = state.get("tool_name")
-        tool_args = state.get("tool_args", {})
+        tool_args = dict(state.get("tool_args") or {})
 
         if not tool_name:
-            if not state.get("result"):
-                state["result"] = "No action could be determined."
-            return state
+            return {"result": state.get("result") or "No action could be determined."}
 
-        tool = self.tool_registry.get(tool_name)
-        if not tool:
-            state["result"] = f"❌ Unknown action: {tool_name}"
-            return state
+        dispatch = self._dispatch.get(tool_name)
+        if not dispatch:
+            return {"result": f"❌ Unknown action: {tool_name}"}
 
         # ALWAYS inject context values - LLM hallucinates user_id and wallet_address
-        # Don't rely on signature inspection - just force correct values
         context_user_id = state.get("user_id")
         context_wallet = state.get("wallet_address")
-        
-        # Tools that need wallet_address
-        wallet_tools = ["get_balance", "send_sui", "get_transaction_history", "get_nfts"]
-        # Tools that need user_id
-        user_tools = ["list_contacts", "add_new_contact", "delete_contact", "send_sui", "reset_conversation", "disconnect_wallet", "full_reset"]
-        
+        inject = self._inject_params.get(tool_name, frozenset())
+
         # Force inject correct values (override any LLM hallucinations)
-        if tool_name in wallet_tools and context_wallet:
+        if "wallet_address" in inject and context_wallet:
             old_val = tool_args.get("wallet_address")
             if old_val and old_val != context_wallet:
-                logger.info(f"Overriding LLM wallet_address={old_val} with correct value")
+                logger.info("Overriding LLM wallet_address=%s with correct value", old_val)
             tool_args["wallet_address"] = context_wallet
             
-        if tool_name in user_tools and context_user_id:
+        if "user_id" in inject and context_user_id:
             old_val = tool_args.get("user_id")
             if old_val and old_val != context_user_id:
-                logger.info(f"Overriding LLM user_id={old_val} with correct value")
+                logger.info("Overriding LLM user_id=%s with correct value", old_val)
             tool_args["user_id"] = context_user_id
 
-        logger.info(f"Final tool_args for {tool_name}: {tool_args}")
+        logger.info("Final tool_args for %s: %s", tool_name, tool_args)
 
         # Check if wallet_address is required but still missing
-        if "wallet_address" in tool_args or tool_name in ["get_balance", "send_sui", "get_transaction_history", "get_nfts"]:
+        if "wallet_address" in tool_args or "wallet_address" in inject:
             if not tool_args.get("wallet_address"):
-                state["result"] = "❌ No wallet linked yet. Use /start to connect your wallet first."
-                state["error"] = "no_wallet"
-                return state
+                return {
+                    "result": "❌ No wallet linked yet. Use /start to connect your wallet first.",
+                    "error": "no_wallet",
+                }
 
         # Execute tool
         try:
-            func = tool.func if hasattr(tool, 'func') else tool
-            if hasattr(tool, "ainvoke"):
-                result = await tool.ainvoke(tool_args)
-            elif asyncio.iscoroutinefunction(func):
-                result = await func(**tool_args)
-            elif hasattr(tool, "invoke"):
-                result = await asyncio.to_thread(tool.invoke, tool_args)
-            else:
-                result = await asyncio.to_thread(func, **tool_args)
-
-            # Handle dict results (send_sui returns signing data)
-            if isinstance(result, dict):
-                if result.get("error"):
-                    state["result"] = f"❌ {result['error']}"
-                elif result.get("needs_signing"):
-                    state["result"] = result.get("message", "Transaction ready")
-                    state["needs_signing"] = True
-                    state["tx_data"] = result
-                else:
-                    state["result"] = result.get("message", str(result))
-            else:
-                state["result"] = str(result)
+            result = await dispatch(tool_args)
+        except Exception as e:
+            logger.exception("Tool %s failed", tool_name)
+            return {"result": f"❌ Error executing {tool_name}: {e}", "error": str(e)}
 
-            logger.info(f"Tool {tool_name} executed successfully")
+        logger.info("Tool %s executed successfully", tool_name)
 
-        except Exception as e:
-            logger.exception(f"Tool {tool_name} failed")
-            state["result"] = f"❌ Error executing {tool_name}: {e}"
-            state["error"] = str(e)
+        # Handle dict results (send_sui returns signing data)
+        if not isinstance(result, dict):
+            return {"result": str(result)}
+        if result.get("error"):
+            return {"result": f"❌ {result['error']}"}
+        if result.get("needs_signing"):
+            return {
+                "result": result.get("message", "Transaction ready"),
+                "needs_signing": True,
+                "tx_data": result,
+            }
+        return {"result": result.get("message", str(result))}
 
-        return state
+    async def _generate_chat(self, state: AgentState, config: RunnableConfig) -> AgentState:
+        """Node: Generate natural conversation response (unless drafted during classify)"""
+        if "result" in state:
+            return {"result": state["result"]}  # LangGraph rejects nodes that write nothing
+        return await self._chat(state, config["configurable"].get("on_token"))
 
-    async def _generate_chat(self, state: AgentState) -> AgentState:
-        """Node: Generate natural conversation response"""
+    async def _chat(self, state: AgentState, on_token: Optional[TokenCallback] = None) -> AgentState:
+        """Generate natural conversation response, streaming chunks to on_token; returns the result keys"""
         user_input = state["user_input"]
         wallet_address = state.get("wallet_address")
-        wallet_status = "linked" if wallet_address else "not linked yet"
-
-        system_msg = f"""You are a friendly AI assistant for a Sui blockchain wallet on Telegram.
-
-User's wallet status: {wallet_status}
+        system_msg = CHAT_PROMPT if wallet_address else CHAT_PROMPT_NO_WALLET
 
-You help users with:
-- Checking their SUI balance
-- Sending SUI to addresses or contacts
-- Managing contacts (add, list, remove)
-- Viewing transaction history
-- Understanding the Sui blockchain and crypto concepts
-
-Be friendly, helpful, and concise. If the user needs to take a wallet action, guide them.
-Examples: "Just say 'check my balance' or 'send 1 SUI to alice'"
-
-If they haven't linked a wallet yet, mention they can use /start to connect one.
-
-Keep responses short - this is a chat interface, not a document."""
+        # Greetings and thanks repeat verbatim; reuse their reply instead of regenerating it
+        normalized = " ".join(user_input.lower().split())
+        cache_key = (bool(wallet_address), normalized) if len(normalized) <= CHAT_CACHE_MAX_CHARS else None
+        cached = self._chat_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            if on_token is not None:
+                await on_token(cached)
+            return {"result": cached}
 
         try:
-            response = await asyncio.to_thread(
-                self.chat_llm.invoke,
-                [("system", system_msg), ("human", user_input)],
-            )
-            state["result"] = response.content
+            parts: List[str] = []
+            async with gemini_slot():
+                async for chunk in self.chat_llm.astream(
+                    [("system", system_msg), ("human", user_input)],
+                ):
+                    if not chunk.content:
+                        continue
+                    parts.append(chunk.content)
+                    if on_token is not None:
+                        await on_token(chunk.content)
+            reply = "".join(parts)
+            if cache_key and reply:
+                self._chat_cache.set(cache_key, reply)
+            return {"result": reply}
         except Exception as e:
-            logger.error(f"Chat generation failed: {e}")
-            state["result"] = "I'm here to help with your Sui wallet! Try asking about your balance, sending SUI, or managing contacts."
-            state["error"] = str(e)
-
-        return state
+            logger.error("Chat generation failed: %s", e)
+            return {
+                "result": "I'm here to help with your Sui wallet! Try asking about your balance, sending SUI, or managing contacts.",
+                "error": str(e),
+            }
 
     # ========================================================================
     # Public Interface
@@ -519,9 +729,11 @@ Keep responses short - this is a chat interface, not a document."""
         user_input: str,
         user_id: str,
         wallet_address: Optional[str] = None,
+        on_token: Optional[TokenCallback] = None,
     ) -> Dict[str, Any]:
         """
-        Main entry point - runs the LangGraph agent.
+        Main entry point - runs the LangGraph agent (bare FAST_COMMANDS call their tool directly).
+        Chat replies are streamed chunk by chunk to on_token (if given) before "text" is returned.
 
         Returns:
             {
@@ -542,7 +754,13 @@ Keep responses short - this is a chat interface, not a document."""
         }
 
         try:
-            final_state = await self.app.ainvoke(initial_state)
+            command = fast_command(user_input)
+            if command is not None:
+                tool_name, domain, tool_args = command
+                final_state = {**initial_state, "domain": domain, "tool_name": tool_name, "tool_args": tool_args}
+                final_state.update(await self._run_tool(final_state))
+            else:
+                final_state = await self._invoke_graph(initial_state, on_token)
 
             domain = final_state.get("domain", Domain.conversation)
             result = final_state.get("result", "I'm not sure how to help with that.")
@@ -567,6 +785,21 @@ Keep responses short - this is a chat interface, not a document."""
                 "tx_data": None,
             }
 
+    async def _invoke_graph(self, initial_state: AgentState, on_token: Optional[TokenCallback]) -> AgentState:
+        """Run the graph; each Gemini call inside waits for its own slot (see gemini_slot)"""
+        config: RunnableConfig = {"configurable": {"agent": self, "on_token": on_token}}
+        return await self.app.ainvoke(initial_state, config=config)
+
+
+# Backwards-compatible name used by tests and older callers
+WalletAgent = WalletGraphAgent
 
-# Singleton instance
-wallet_agent = WalletGraphAgent()
+
+@functools.cache
+def get_wallet_agent() -> WalletGraphAgent:
+    """
+    Shared agent, built on first use so importing this module stays cheap.
+    Call it from inside the running event loop: langchain-google-genai creates its async
+    client during construction and rejects ainvoke/astream if no loop was running then.
+    """
+    return WalletGraphAgent()
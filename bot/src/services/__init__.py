@@ -1,4 +1,13 @@
-from src.services.gemini import GeminiService
 from src.services.sui import SuiService
 
+
+# gemini imports google.genai, which is slow to load; only pull it in when GeminiService is used
+def __getattr__(name: str):
+    if name == "GeminiService":
+        from src.services.gemini import GeminiService
+
+        return GeminiService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = ["GeminiService", "SuiService"]
@@ -1,14 +1,15 @@
 """Gemini AI service for chat and audio transcription"""
 
+import functools
 import logging
-import base64
 from typing import Optional, Dict, Any, List
-from pathlib import Path
 
 from google import genai
 from google.genai import types
 
 from src.core import settings
+from src.utils.cache import TTLCache
+from src.utils.concurrency import gemini_slot
 
 logger = logging.getLogger(__name__)
 
@@ -110,29 +111,40 @@ prepare transactions that they will sign using their wallet."""
             ])
         ]
 
-    async def transcribe_audio(self, audio_path: str) -> str:
-        """Transcribe audio file using Gemini's multimodal capabilities"""
+        # chat() configs differ only in the wallet line of the system instruction; build each once
+        self._chat_config_no_wallet = types.GenerateContentConfig(
+            system_instruction=self.system_prompt
+            + "\n\nUser has NOT linked a wallet yet. Remind them to use /start to connect one.",
+            tools=self.tools,
+            temperature=0.7,
+        )
+        self._chat_configs = TTLCache(ttl=3600, maxsize=1024)
+
+    def _chat_config(self, wallet_address: Optional[str]) -> types.GenerateContentConfig:
+        """GenerateContentConfig for chat(), cached per wallet address"""
+        if not wallet_address:
+            return self._chat_config_no_wallet
+        config = self._chat_configs.get(wallet_address)
+        if config is None:
+            config = self._chat_config_no_wallet.model_copy(update={
+                "system_instruction": f"{self.system_prompt}\n\nUser's wallet address: {wallet_address}",
+            })
+            self._chat_configs.set(wallet_address, config)
+        return config
+
+    async def _generate_content(self, **kwargs: Any) -> types.GenerateContentResponse:
+        """Async generate_content, waiting for a slot shared with the wallet agent"""
+        async with gemini_slot():
+            return await self.client.aio.models.generate_content(**kwargs)
+
+    async def transcribe_audio(self, audio: bytes, mime_type: str = "audio/ogg") -> str:
+        """
+        Transcribe in-memory audio using Gemini's multimodal capabilities.
+        Telegram voice notes (OGG/Opus) should be sent as-is; Gemini decodes them natively.
+        """
         try:
-            # Read audio file
-            audio_file = Path(audio_path)
-            if not audio_file.exists():
-                raise FileNotFoundError(f"Audio file not found: {audio_path}")
-
-            audio_bytes = audio_file.read_bytes()
-            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-
-            # Determine mime type
-            suffix = audio_file.suffix.lower()
-            mime_types = {
-                '.ogg': 'audio/ogg',
-                '.wav': 'audio/wav',
-                '.mp3': 'audio/mp3',
-                '.m4a': 'audio/mp4',
-            }
-            mime_type = mime_types.get(suffix, 'audio/ogg')
-
             # Create content with audio
-            response = self.client.models.generate_content(
+            response = await self._generate_content(
                 model=self.model,
                 contents=[
                     types.Content(
@@ -140,7 +152,7 @@ prepare transactions that they will sign using their wallet."""
                             types.Part(
                                 inline_data=types.Blob(
                                     mime_type=mime_type,
-                                    data=audio_bytes,
+                                    data=audio,
                                 )
                             ),
                             types.Part(text="Transcribe this audio message exactly. Output only the transcription, nothing else."),
@@ -150,7 +162,7 @@ prepare transactions that they will sign using their wallet."""
             )
 
             transcription = response.text.strip()
-            logger.info(f"Transcribed audio: {transcription[:100]}...")
+            logger.info("Transcribed audio: %.100s...", transcription)
             return transcription
 
         except Exception as e:
@@ -174,13 +186,6 @@ prepare transactions that they will sign using their wallet."""
             }
         """
         try:
-            # Build context
-            context_parts = [self.system_prompt]
-            if wallet_address:
-                context_parts.append(f"\nUser's wallet address: {wallet_address}")
-            else:
-                context_parts.append("\nUser has NOT linked a wallet yet. Remind them to use /start to connect one.")
-
             # Build conversation history
             contents = []
 
@@ -200,14 +205,10 @@ prepare transactions that they will sign using their wallet."""
             ))
 
             # Generate response with function calling
-            response = self.client.models.generate_content(
+            response = await self._generate_content(
                 model=self.model,
                 contents=contents,
-                config=types.GenerateContentConfig(
-                    system_instruction="\n".join(context_parts),
-                    tools=self.tools,
-                    temperature=0.7,
-                ),
+                config=self._chat_config(wallet_address),
             )
 
             result = {
@@ -246,7 +247,7 @@ prepare transactions that they will sign using their wallet."""
     async def simple_response(self, prompt: str) -> str:
         """Generate a simple text response without function calling"""
         try:
-            response = self.client.models.generate_content(
+            response = await self._generate_content(
                 model=self.model,
                 contents=prompt,
             )
@@ -256,5 +257,7 @@ prepare transactions that they will sign using their wallet."""
             return f"Error: {str(e)}"
 
 
-# Singleton instance
-gemini_service = GeminiService()
+@functools.cache
+def get_gemini_service() -> GeminiService:
+    """Shared service, built on first use so importing src.services needs no API key"""
+    return GeminiService()
@@ -1,18 +1,44 @@
 """Sui blockchain service for balance, transactions, and history"""
 
+import asyncio
+import heapq
 import logging
-from typing import Optional, Dict, Any, List
-from decimal import Decimal
+from typing import Optional, Dict, Any, List, Callable, Awaitable, Hashable, Tuple
 
 import httpx
 
 from src.core import settings
+from src.utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
 # Constants
 MIST_PER_SUI = 1_000_000_000
 SUI_COIN_TYPE = "0x2::sui::SUI"
+COIN_OBJECT_TYPE_PREFIX = "0x2::coin::Coin<"
+# Fullnodes reject object queries for more than 50 objects per request
+MAX_OBJECTS_PER_REQUEST = 50
+
+TX_KIND_SUMMARY = {"sent": "Sent SUI", "received": "Received SUI"}
+
+# Short read-through cache TTLs (seconds) for per-address RPC reads
+BALANCE_CACHE_TTL = 10
+HISTORY_CACHE_TTL = 15
+OBJECTS_CACHE_TTL = 15
+
+
+def format_sui(mist: int) -> str:
+    """MIST amount as SUI with 4 decimals, using integer math only (rounds like Decimal: half to even)"""
+    units, rest = divmod(mist, 100_000)
+    if rest > 50_000 or (rest == 50_000 and units % 2):
+        units += 1
+    whole, frac = divmod(units, 10_000)
+    return f"{whole}.{frac:04d} SUI"
+
+
+def _timestamp_ms(tx: Dict[str, Any]) -> int:
+    # The RPC returns timestampMs as a decimal string
+    return int(tx.get("timestampMs") or 0)
 
 
 class SuiService:
@@ -21,40 +47,106 @@ class SuiService:
     def __init__(self):
         self.rpc_url = settings.SUI_RPC_URL
         self.network = settings.SUI_NETWORK
+        self._explorer_tx_prefix = f"https://suiscan.xyz/{self.network}/tx/"
+        self._balance_cache = TTLCache(ttl=BALANCE_CACHE_TTL, maxsize=4096)
+        self._history_cache = TTLCache(ttl=HISTORY_CACHE_TTL, maxsize=4096)
+        self._objects_cache = TTLCache(ttl=OBJECTS_CACHE_TTL, maxsize=4096)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        """Process-wide keep-alive client, so RPC calls skip the TCP/TLS handshake"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=30),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        """Close the pooled HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _cached(self, cache: TTLCache, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Read-through cache that stores the in-flight task, so concurrent
+        callers for the same key share a single RPC round-trip.
+        """
+        task = cache.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            cache.set(key, task)
+        try:
+            # shield: a cancelled caller must not cancel the shared request
+            return await asyncio.shield(task)
+        except Exception:
+            if cache.get(key) is task:
+                cache.pop(key)
+            raise
 
     async def _rpc_call(self, method: str, params: List[Any]) -> Any:
         """Make a JSON-RPC call to the Sui node"""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                self.rpc_url,
-                json={
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": method,
-                    "params": params,
-                },
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            if "error" in data:
-                raise Exception(f"RPC error: {data['error']}")
-
-            return data.get("result")
+        response = await self._http().post(
+            self.rpc_url,
+            json={
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": method,
+                "params": params,
+            },
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        if "error" in data:
+            raise Exception(f"RPC error: {data['error']}")
+
+        return data.get("result")
+
+    async def _rpc_batch(self, calls: List[Tuple[str, List[Any]]]) -> List[Any]:
+        """Send several JSON-RPC calls in one batched POST; results come back in call order"""
+        response = await self._http().post(
+            self.rpc_url,
+            json=[
+                {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+                for i, (method, params) in enumerate(calls)
+            ],
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        if not isinstance(data, list):
+            # Whole batch rejected (e.g. a gateway without batch support)
+            raise Exception(f"RPC error: {data.get('error', data)}")
+
+        # Batch responses may arrive in any order
+        by_id = {item.get("id"): item for item in data}
+        results = []
+        for i in range(len(calls)):
+            item = by_id.get(i)
+            if item is None:
+                raise Exception(f"RPC error: no response for batched call {i}")
+            if "error" in item:
+                raise Exception(f"RPC error: {item['error']}")
+            results.append(item.get("result"))
+        return results
 
     async def get_balance(self, address: str) -> Dict[str, Any]:
-        """Get SUI balance for an address"""
+        """Get SUI balance for an address (cached for BALANCE_CACHE_TTL)"""
+        return await self._cached(self._balance_cache, ("sui", address), lambda: self._fetch_balance(address))
+
+    async def _fetch_balance(self, address: str) -> Dict[str, Any]:
         try:
             result = await self._rpc_call("suix_getBalance", [address, SUI_COIN_TYPE])
 
             total_balance = int(result.get("totalBalance", 0))
-            sui_balance = Decimal(total_balance) / Decimal(MIST_PER_SUI)
 
             return {
                 "address": address,
                 "sui": {
                     "total": total_balance,
-                    "formatted": f"{sui_balance:.4f} SUI",
+                    "formatted": format_sui(total_balance),
                 },
                 "coin_count": result.get("coinObjectCount", 0),
             }
@@ -63,7 +155,10 @@ class SuiService:
             raise
 
     async def get_all_balances(self, address: str) -> Dict[str, Any]:
-        """Get all token balances for an address"""
+        """Get all token balances for an address (cached for BALANCE_CACHE_TTL)"""
+        return await self._cached(self._balance_cache, ("all", address), lambda: self._fetch_all_balances(address))
+
+    async def _fetch_all_balances(self, address: str) -> Dict[str, Any]:
         try:
             result = await self._rpc_call("suix_getAllBalances", [address])
 
@@ -75,10 +170,9 @@ class SuiService:
                 total = int(balance.get("totalBalance", 0))
 
                 if coin_type == SUI_COIN_TYPE:
-                    sui_formatted = Decimal(total) / Decimal(MIST_PER_SUI)
                     sui_balance = {
                         "total": total,
-                        "formatted": f"{sui_formatted:.4f} SUI",
+                        "formatted": format_sui(total),
                     }
                 else:
                     # Extract token symbol from coin type
@@ -113,51 +207,35 @@ class SuiService:
         limit: int = 10,
         cursor: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Get transaction history for an address"""
+        """Get transaction history for an address (cached for HISTORY_CACHE_TTL)"""
+        return await self._cached(
+            self._history_cache,
+            (address, limit, cursor),
+            lambda: self._fetch_transaction_history(address, limit, cursor),
+        )
+
+    async def _fetch_transaction_history(
+        self,
+        address: str,
+        limit: int,
+        cursor: Optional[str],
+    ) -> Dict[str, Any]:
         try:
-            # Query transactions from address
-            from_result = await self._rpc_call(
-                "suix_queryTransactionBlocks",
-                [{
-                    "filter": {"FromAddress": address},
-                    "options": {
-                        "showInput": True,
-                        "showEffects": True,
-                        "showEvents": False,
-                    },
-                }, cursor, limit, True]
-            )
-
-            # Query transactions to address
-            to_result = await self._rpc_call(
-                "suix_queryTransactionBlocks",
-                [{
-                    "filter": {"ToAddress": address},
-                    "options": {
-                        "showInput": True,
-                        "showEffects": True,
-                        "showEvents": False,
-                    },
-                }, cursor, limit, True]
-            )
-
-            # Combine and deduplicate
-            all_txs = {}
-            for tx in from_result.get("data", []):
-                digest = tx.get("digest")
-                all_txs[digest] = {**tx, "kind": "sent"}
-
+            # Sent and received queries go out as one batched request
+            options = {"showInput": True, "showEffects": True, "showEvents": False}
+            from_result, to_result = await self._rpc_batch([
+                ("suix_queryTransactionBlocks", [{"filter": {"FromAddress": address}, "options": options}, cursor, limit, True]),
+                ("suix_queryTransactionBlocks", [{"filter": {"ToAddress": address}, "options": options}, cursor, limit, True]),
+            ])
+
+            # Combine and deduplicate (a self-transfer counts as sent)
+            all_txs = {tx.get("digest"): {**tx, "kind": "sent"} for tx in from_result.get("data", [])}
             for tx in to_result.get("data", []):
-                digest = tx.get("digest")
-                if digest not in all_txs:
-                    all_txs[digest] = {**tx, "kind": "received"}
+                if tx.get("digest") not in all_txs:
+                    all_txs[tx.get("digest")] = {**tx, "kind": "received"}
 
-            # Sort by timestamp (descending)
-            sorted_txs = sorted(
-                all_txs.values(),
-                key=lambda x: x.get("timestampMs", 0),
-                reverse=True
-            )[:limit]
+            # Newest first; only the top `limit` are needed, so skip sorting the rest
+            sorted_txs = heapq.nlargest(limit, all_txs.values(), key=_timestamp_ms)
 
             # Format transactions
             items = []
@@ -183,20 +261,13 @@ class SuiService:
         effects = tx.get("effects", {})
         status = effects.get("status", {}).get("status", "unknown")
 
-        # Try to extract transfer amount
-        summary = "Transaction"
-        if kind == "sent":
-            summary = "Sent SUI"
-        elif kind == "received":
-            summary = "Received SUI"
-
         return {
             "digest": digest,
             "timestampMs": int(timestamp_ms) if timestamp_ms else None,
             "kind": kind,
             "status": status,
-            "summary": summary,
-            "explorerUrl": f"https://suiscan.xyz/{self.network}/tx/{digest}",
+            "summary": TX_KIND_SUMMARY.get(kind, "Transaction"),
+            "explorerUrl": self._explorer_tx_prefix + digest,
         }
 
     async def build_transfer_tx(
@@ -230,6 +301,10 @@ class SuiService:
                 ]
             )
 
+            # The sender is about to spend; don't serve the pre-transfer balance afterwards
+            self._balance_cache.pop(("sui", sender))
+            self._balance_cache.pop(("all", sender))
+
             return {
                 "txBytes": tx_bytes,
                 "sender": sender,
@@ -260,7 +335,20 @@ class SuiService:
         limit: int = 50,
         cursor: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Get all objects owned by an address"""
+        """Get one page (at most MAX_OBJECTS_PER_REQUEST) of objects owned by an address (cached for OBJECTS_CACHE_TTL)"""
+        limit = min(limit, MAX_OBJECTS_PER_REQUEST)
+        return await self._cached(
+            self._objects_cache,
+            (address, limit, cursor),
+            lambda: self._fetch_owned_objects(address, limit, cursor),
+        )
+
+    async def _fetch_owned_objects(
+        self,
+        address: str,
+        limit: int,
+        cursor: Optional[str],
+    ) -> Dict[str, Any]:
         try:
             result = await self._rpc_call(
                 "suix_getOwnedObjects",
@@ -1,3 +1,17 @@
-from src.utils.audio_processor import download_file_from_telegram, convert_ogg_to_wav
+from src.utils.cache import TTLCache
+from src.utils.concurrency import gemini_slot
 
-__all__ = ["download_file_from_telegram", "convert_ogg_to_wav"]
+# audio_processor imports aiogram, which is slow to load; resolve its helpers on first access
+# so importing src.utils.cache (e.g. from the database layer) stays cheap
+_AUDIO_EXPORTS = frozenset({"download_file_from_telegram", "convert_ogg_to_wav_async"})
+
+
+def __getattr__(name: str):
+    if name in _AUDIO_EXPORTS:
+        from src.utils import audio_processor
+
+        return getattr(audio_processor, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["download_file_from_telegram", "convert_ogg_to_wav_async", "TTLCache", "gemini_slot"]
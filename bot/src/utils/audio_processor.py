@@ -1,39 +1,55 @@
 """Audio processing utilities - uses Gemini for transcription"""
 
+import asyncio
 import os
 import logging
-import ffmpeg
-from pathlib import Path
+import struct
+from typing import Optional
 
 from aiogram import Bot
 
 logger = logging.getLogger(__name__)
 
-
-async def download_file_from_telegram(bot: Bot, file_id: str) -> str:
-    """Download a file from Telegram"""
-    ogg_path = "files/input.ogg"
-    os.makedirs("files", exist_ok=True)
-
-    # Download Telegram file
-    file = await bot.get_file(file_id)
-    await bot.download_file(file.file_path, ogg_path)
-
-    return ogg_path
-
-
-def convert_ogg_to_wav(ogg_path: str, wav_path: str = "files/input.wav") -> str:
-    """Convert OGG audio to WAV format for better compatibility"""
-    try:
-        (
-            ffmpeg
-            .input(ogg_path)
-            .output(wav_path, ac=1, ar=16000)  # Mono, 16kHz for speech
-            .overwrite_output()
-            .run(quiet=True)
-        )
-        return wav_path
-    except Exception as e:
-        logger.error(f"Failed to convert '{ogg_path}' to WAV: {e}")
-        # Return original file if conversion fails
-        return ogg_path
+# Bound concurrent ffmpeg processes to the number of CPUs
+_ffmpeg_slots = asyncio.Semaphore(os.cpu_count() or 1)
+
+
+async def download_file_from_telegram(bot: Bot, file_id: str) -> bytes:
+    """Download a file from Telegram into memory"""
+    # No destination: aiogram streams into a fresh BytesIO, so concurrent downloads can't collide
+    buffer = await bot.download(file_id)
+    return buffer.getvalue()
+
+
+def _finalize_wav(wav: bytes) -> bytes:
+    """Fill in the RIFF/data chunk sizes ffmpeg leaves unset when writing WAV to a pipe"""
+    data_at = wav.find(b"data", 12)
+    if not wav.startswith(b"RIFF") or data_at < 0:
+        return wav
+    buf = bytearray(wav)
+    struct.pack_into("<I", buf, 4, len(buf) - 8)
+    struct.pack_into("<I", buf, data_at + 4, len(buf) - data_at - 8)
+    return bytes(buf)
+
+
+async def convert_ogg_to_wav_async(ogg_bytes: bytes) -> Optional[bytes]:
+    """Convert OGG audio to mono 16kHz WAV via ffmpeg pipes (no temp files); None if ffmpeg fails"""
+    async with _ffmpeg_slots:
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+                "-ac", "1", "-ar", "16000",  # Mono, 16kHz for speech
+                "-f", "wav", "pipe:1",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            wav_bytes, stderr = await proc.communicate(ogg_bytes)
+        except OSError as e:
+            logger.error("Failed to run ffmpeg: %s", e)
+            return None
+
+    if proc.returncode != 0:
+        logger.error("Failed to convert OGG to WAV: %s", stderr.decode(errors="replace").strip())
+        return None
+    return _finalize_wav(wav_bytes)
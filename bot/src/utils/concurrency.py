@@ -0,0 +1,15 @@
+"""Process-wide concurrency limits"""
+
+import asyncio
+from contextlib import AbstractAsyncContextManager, nullcontext
+
+from src.core import settings
+
+# One limiter for every Gemini request (wallet agent and GeminiService alike), so
+# GEMINI_CONCURRENCY is the real process-wide cap rather than a per-caller one
+_gemini_slots = asyncio.Semaphore(settings.GEMINI_CONCURRENCY) if settings.GEMINI_CONCURRENCY > 0 else None
+
+
+def gemini_slot() -> AbstractAsyncContextManager:
+    """Hold around a single Gemini request; a no-op when GEMINI_CONCURRENCY is 0"""
+    return _gemini_slots if _gemini_slots is not None else nullcontext()
@@ -0,0 +1,22 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+try:
+    import uvloop
+except ImportError:  # optional here: tests fall back to the default asyncio loop
+    uvloop = None
+
+# Make the bot root importable (the code lives in the `src` package) once per session
+_bot_root = str(Path(__file__).resolve().parents[1])
+if _bot_root not in sys.path:
+    sys.path.insert(0, _bot_root)
+
+# Async tests run on uvloop, the loop the bot itself runs on, when it is installed
+if uvloop is not None:
+    if sys.version_info >= (3, 13):
+        unittest.IsolatedAsyncioTestCase.loop_factory = staticmethod(uvloop.new_event_loop)
+    else:
+        # loop_factory is 3.13+; older runners only pick the loop up from the policy
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
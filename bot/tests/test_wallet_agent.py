@@ -1,14 +1,7 @@
-import asyncio
-import sys
 import unittest
-from pathlib import Path
 from typing import Any, Dict
 
-repo_root = Path(__file__).resolve().parents[2]
-sys.path.append(str(repo_root / "bot"))
-sys.path.append(str(repo_root / "bot" / "src"))
-
-from src.llm.domains import Domain, DomainDecision
+from src.llm.domains import Domain
 from src.llm.wallet_agent import WalletAgent
 
 
@@ -20,60 +13,79 @@ class _FakeToolMsg:
 class _FakeLLM:
     """
     Minimal fake LLM to drive WalletAgent without network calls.
-    - First ainvoke returns DomainDecision
-    - Second ainvoke (after bind_tools) returns a tool call with given args
+    Every bound call (the planner over all tools, or a domain's tool selection)
+    returns one tool call with the given name and args; `bound` records that
+    the agent asked the LLM at all.
     """
 
-    def __init__(self, domain: Domain, tool_name: str, tool_args: Dict[str, Any]):
-        self.domain = domain
-        self.tool_name = tool_name
-        self.tool_args = tool_args
+    def __init__(self, tool_name: str, tool_args: Dict[str, Any]):
         self.bound = False
+        self._tool_msg = _FakeToolMsg(tool_name, tool_args)
 
-    def with_structured_output(self, schema):
-        self.schema = schema
-        return self
-
-    def bind_tools(self, tools):
+    def bind_tools(self, tools, **kwargs):
         self.bound = True
         self.bound_tools = tools
         return self
 
     async def ainvoke(self, messages):
-        if self.bound:
-            return _FakeToolMsg(self.tool_name, self.tool_args)
-        return DomainDecision(
-            domain=self.domain,
-            confidence=0.9,
-            reason="test",
-            requires_wallet=self.domain
-            not in {Domain.help, Domain.conversation},
-        )
+        return self._tool_msg
 
 
-class WalletAgentTests(unittest.IsolatedAsyncioTestCase):
-    async def test_send_sui_returns_signing_payload(self):
-        fake_llm = _FakeLLM(
-            domain=Domain.payments,
-            tool_name="send_sui",
-            tool_args={"recipient": "0xabc", "amount": 1.0},
-        )
+class _FailingToolLLM(_FakeLLM):
+    """Fails every tool call, so keyword-classified input falls back to the regex tool selection"""
 
-        async def fake_send_sui(recipient: str, amount: float, wallet_address: str, user_id: str):
-            return {
-                "action": "send_sui",
-                "recipient": recipient,
-                "amount": amount,
-                "sender": wallet_address,
-                "needs_signing": True,
-                "message": "ready",
-            }
+    async def ainvoke(self, messages):
+        raise RuntimeError("tool selection unavailable")
+
+
+async def _fake_send_sui(recipient: str, amount: float, wallet_address: str, user_id: str):
+    return {
+        "action": "send_sui",
+        "recipient": recipient,
+        "amount": amount,
+        "sender": wallet_address,
+        "needs_signing": True,
+        "message": "ready",
+    }
+
+
+async def _fake_help():
+    return "help text"
+
+
+_SEND_ARGS = {"recipient": "0xabc", "amount": 1.0}
+_ADDRESS = "0x" + "a" * 64
+
+
+def _help_tools(calls: list) -> Dict[str, Any]:
+    """Help-domain registry whose destructive tools only record that they ran"""
+
+    def recorder(name: str):
+        async def tool(user_id: str):
+            calls.append(name)
+            return f"{name} done"
+        return tool
+
+    return {
+        "get_help": _fake_help,
+        "full_reset": recorder("full_reset"),
+        "disconnect_wallet": recorder("disconnect_wallet"),
+        "reset_conversation": recorder("reset_conversation"),
+    }
 
-        agent = WalletAgent(
-            llm=fake_llm,
-            domain_tools={Domain.payments: [fake_send_sui]},
-            tool_registry={"send_sui": fake_send_sui},
-        )
+
+def _make_agent(domain: Domain, tool_name: str, tool_args: Dict[str, Any], tools: Dict[str, Any]) -> WalletAgent:
+    """Agent on a fresh _FakeLLM (it keeps per-run state) whose domain exposes the given tools"""
+    return WalletAgent(
+        llm=_FakeLLM(tool_name=tool_name, tool_args=tool_args),
+        domain_tools={domain: list(tools.values())},
+        tool_registry=tools,
+    )
+
+
+class WalletAgentTests(unittest.IsolatedAsyncioTestCase):
+    async def test_send_sui_returns_signing_payload(self):
+        agent = _make_agent(Domain.payments, "send_sui", _SEND_ARGS, {"send_sui": _fake_send_sui})
 
         result = await agent.run("send 1 sui", user_id="u1", wallet_address="0xsender")
         self.assertTrue(result["needs_signing"])
@@ -82,42 +94,79 @@ class WalletAgentTests(unittest.IsolatedAsyncioTestCase):
         self.assertIsNotNone(result["tx_data"])
 
     async def test_help_returns_text(self):
-        fake_llm = _FakeLLM(
-            domain=Domain.help,
-            tool_name="get_help",
-            tool_args={},
-        )
-
-        async def fake_help():
-            return "help text"
-
-        agent = WalletAgent(
-            llm=fake_llm,
-            domain_tools={Domain.help: [fake_help]},
-            tool_registry={"get_help": fake_help},
-        )
+        agent = _make_agent(Domain.help, "get_help", {}, {"get_help": _fake_help})
 
         result = await agent.run("help", user_id="u1", wallet_address=None)
         self.assertFalse(result["needs_signing"])
         self.assertIn("help text", result["text"])
 
     async def test_fallback_without_wallet(self):
-        fake_llm = _FakeLLM(
-            domain=Domain.payments,
-            tool_name="send_sui",
-            tool_args={"recipient": "0xabc", "amount": 1.0},
-        )
-
-        agent = WalletAgent(
-            llm=fake_llm,
-            domain_tools={Domain.payments: []},
-            tool_registry={},
-        )
+        agent = _make_agent(Domain.payments, "send_sui", _SEND_ARGS, {})
 
         result = await agent.run("send 1 sui", user_id="u1", wallet_address=None)
         self.assertIn("No wallet linked", result["text"])
         self.assertFalse(result["needs_signing"])
 
+    async def test_questions_about_destructive_actions_ask_the_llm(self):
+        for text in ("what does full reset do?", "how do i disconnect my wallet?"):
+            with self.subTest(text=text):
+                calls = []
+                agent = _make_agent(Domain.help, "get_help", {}, _help_tools(calls))
+
+                result = await agent.run(text, user_id="u1", wallet_address="0xsender")
+                self.assertTrue(agent.llm.bound)
+                self.assertEqual(calls, [])
+                self.assertIn("help text", result["text"])
+
+    async def test_destructive_fallback_requires_explicit_command(self):
+        calls = []
+        tools = _help_tools(calls)
+        agent = WalletAgent(
+            llm=_FailingToolLLM(tool_name="full_reset", tool_args={}),
+            domain_tools={Domain.help: list(tools.values())},
+            tool_registry=tools,
+        )
+
+        result = await agent.run("full reset please", user_id="u1", wallet_address="0xsender")
+        self.assertEqual(calls, [])
+        self.assertIn("/fullreset", result["text"])
+
+        result = await agent.run("reset", user_id="u1", wallet_address="0xsender")
+        self.assertEqual(calls, [])
+        self.assertIn("/reset", result["text"])
+
+    async def test_planned_actions_are_not_reused_across_messages(self):
+        # The planner maps a tool call back to its domain by the function's own name
+        name = _fake_send_sui.__name__
+        agent = _make_agent(Domain.payments, name, _SEND_ARGS, {name: _fake_send_sui})
+        prefix = "please move " + "x" * 130
+
+        first = await agent._classify(prefix + " one")
+        agent.llm._tool_msg = _FakeToolMsg(name, {"recipient": "0xdef", "amount": 2.0})
+        second = await agent._classify(prefix + " two")
+        again = await agent._classify(prefix + " one")
+
+        self.assertEqual(first["tool_args"], _SEND_ARGS)
+        self.assertEqual(second["tool_args"]["recipient"], "0xdef")
+        self.assertEqual(again["tool_args"]["recipient"], "0xdef")
+
+    def test_contact_names_skip_filler_words(self):
+        agent = _make_agent(Domain.contacts, "list_contacts", {}, {})
+        cases = {
+            f"add contact alice {_ADDRESS}": ("add_new_contact", "alice"),
+            f"save address carol {_ADDRESS}": ("add_new_contact", "carol"),
+            "delete contact dave": ("delete_contact", "dave"),
+            "remove my contact bob": ("delete_contact", "bob"),
+        }
+        for text, (tool, name) in cases.items():
+            with self.subTest(text=text):
+                tool_name, args, _ = agent._fallback_tool_selection(Domain.contacts, text)
+                self.assertEqual(tool_name, tool)
+                self.assertEqual(args["name"], name)
+
+        tool_name, _, _ = agent._fallback_tool_selection(Domain.contacts, "remove contact")
+        self.assertIsNone(tool_name)
+
 
 if __name__ == "__main__":
-    asyncio.run(unittest.main())
+    unittest.main()